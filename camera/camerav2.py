@@ -1,110 +1,110 @@
 #!/usr/bin/env python3
 
+import os
 import time
-import datetime
 import threading
-import queue
-import subprocess
 import sys
-from zoneinfo import ZoneInfo
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from picamera2 import Picamera2
 import firebase_admin
 from firebase_admin import credentials, db
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project_root"))
+from frame_bus import FrameBus
+from detection_post import DetectionPostprocessor
+from inference_backend import load_detector
+from motion_gate import GatedDetector, MotionGate
+from tracker import Tracker
+from announce_policy import AnnouncementPolicy
+from firebase_batch import BatchUploader
+from outbox import Outbox
+from local_rtdb import LocalRealtimeDB
+from telemetry_log import TelemetryLog
+from clock import clock
+from speech import SpeechScheduler
+from phrase_cache import alert_vocabulary, make_speaker
+
 # --------------------- CONFIG ---------------------
 FIREBASE_KEY_PATH = "/home/coe/firebase/firebase-key.json"
 FIREBASE_DB_URL = "https://sidp-5fcae-default-rtdb.asia-southeast1.firebasedatabase.app/"
 FIREBASE_ROOT = "objectDetectionDB"
+UPLOAD_FLUSH_MS = 1000          # coalesce detection records into one update() per second
+UPLOAD_BATCH_MAX = 50
+OUTBOX_MAX_BYTES = 50 * 1024 * 1024  # on-disk backlog kept while offline (oldest dropped beyond this)
 
 MODEL_PATH = "yolov8n.pt"
 PICAM_SIZE = (320, 240)         # resolution for speed
 PICAM_FORMAT = "RGB888"         # camera gives frames in OpenCV-friendly BGR -> avoids full-frame color conversion
 DETECTION_INTERVAL = 0.5        # seconds between detections (throttle)
 DETECTION_CONF = 0.35
+MOTION_FULL_REFRESH = 2.0       # seconds between forced full-frame detections when the scene is static
+TRACK_MAX_AGE = 1.5             # seconds a track survives without a matching detection
 ALLOWED_CLASSES = {
     'person', 'car', 'cat', 'dog', 'stop sign',
     'toilet', 'chair', 'bed', 'tv', 'dining table', 'vase'
 }
-ANNOUNCE_COOLDOWN = 5.0         # seconds between same-class announcements
-MALAYSIA_TZ = ZoneInfo("Asia/Kuala_Lumpur")
+ANNOUNCE_CONFIRM_FRAMES = 2     # detections a track needs before it is announced
+ANNOUNCE_REPEAT = 30.0          # seconds before the same track is announced again
+MALAYSIA_TZ = clock.tz          # timestamps come from the shared clock service
 
 SHOW_WINDOW = True              # set False for headless
 # --------------------------------------------------
 
 # --------------------- Firebase init ---------------------
-cred = credentials.Certificate(FIREBASE_KEY_PATH)
-firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DB_URL})
-root = db.reference(FIREBASE_ROOT)
-print("Firebase initialized.")
+if os.environ.get("SIDP_FIREBASE") == "local":
+    # in-process stand-in for tests without network/credentials
+    root = LocalRealtimeDB(os.environ.get("SIDP_FIREBASE_FILE")).reference("/")
+    print("Using local Realtime Database stand-in.")
+else:
+    cred = credentials.Certificate(FIREBASE_KEY_PATH)
+    firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DB_URL})
+    root = db.reference("/")
+    print("Firebase initialized.")
 
 # --------------------- TTS init ---------------------
-tts_queue = queue.Queue(maxsize=32)
-use_pyttsx3 = False
-tts_engine = None
-try:
-    import pyttsx3
-    tts_engine = pyttsx3.init()
-    tts_engine.setProperty("rate", 150)
-    tts_engine.setProperty("volume", 1.0)
-    use_pyttsx3 = True
-    print("pyttsx3 available for TTS.")
-except Exception:
-    use_pyttsx3 = False
-    print("pyttsx3 not available, will try `espeak` for TTS.")
-
-def tts_worker():
-    while True:
-        text = tts_queue.get()
-        if text is None:
-            break
-        try:
-            if use_pyttsx3 and tts_engine is not None:
-                tts_engine.say(text)
-                tts_engine.runAndWait()
-            else:
-                # fallback to espeak if pyttsx3 isn't available
-                subprocess.run(["espeak", text], check=False)
-        except Exception as e:
-            print("TTS error:", e)
-        finally:
-            tts_queue.task_done()
+# preemptive scheduler: repeats of the playing phrase are dropped, stale ones (>2 s) too
+# "<class> detected" phrases are pre-rendered to PCM and played through a persistent sink
+speech = SpeechScheduler(make_speaker(alert_vocabulary(ALLOWED_CLASSES)), max_age_s=2.0).start()
 
 def speak_nonblocking(text):
-    try:
-        tts_queue.put_nowait(text)
-    except queue.Full:
-        # drop TTS if overloaded
-        pass
-
-tts_thread = threading.Thread(target=tts_worker, daemon=True)
-tts_thread.start()
+    # no key: a later announcement must not cut off or replace an earlier one
+    speech.say(text, priority=5)
 
 # --------------------- Model load ---------------------
-print("Loading YOLO model (may take a while)...")
-model = YOLO(MODEL_PATH)
+print("Loading YOLO model (first run exports and benchmarks; later runs use the model cache)...")
+# exported to the fastest available CPU backend and warmed up before the camera starts
+model, model_backend = load_detector(MODEL_PATH, imgsz=320)
 # ensure model_names accessible
 if isinstance(model.names, dict):
     model_names = model.names
 else:
     model_names = {i: n for i, n in enumerate(model.names)}
+# allowed-class mask built once; per-frame filtering is vectorized
+postprocess = DetectionPostprocessor(model_names, ALLOWED_CLASSES)
+
+def run_model(img):
+    return model.predict(img, imgsz=320, conf=DETECTION_CONF, classes=postprocess.class_ids, verbose=False)[0]
+
+gated_detector = GatedDetector(run_model, postprocess, MotionGate(full_refresh_s=MOTION_FULL_REFRESH))
 print("Model loaded.")
 
 # --------------------- Shared state ---------------------
-shared = {
-    "frame": None,            # most recent camera frame (BGR)
-    "frame_lock": threading.Lock(),
-    "detections": [],         # last detections list of dicts
-    "detections_lock": threading.Lock()
-}
-upload_queue = queue.Queue(maxsize=128)
+# Camera frames live in a ring of preallocated buffers: one copy in from the
+# camera, consumers read them by reference (capture + detector + preview + 1 spare)
+frame_bus = FrameBus(slots=4)
+
+# Tracks bridge the detection interval: the preview draws each track
+# extrapolated to the frame being shown, not the boxes from up to 0.5 s ago
+tracker = Tracker(iou_threshold=0.3, max_age_s=TRACK_MAX_AGE)
 stop_event = threading.Event()
 
-# For announcement cooldowns
-last_announced = {}
+# Packed binary detection log, one file per day (roll up with telemetry_log.py)
+telemetry_log = TelemetryLog(tz=MALAYSIA_TZ)
+
+# Announcements per track id (new objects are spoken even if their class was just announced)
+announce_policy = AnnouncementPolicy(confirm_hits=ANNOUNCE_CONFIRM_FRAMES, repeat_s=ANNOUNCE_REPEAT)
 
 # --------------------- Camera capture thread ---------------------
 def camera_capture_worker():
@@ -117,15 +117,13 @@ def camera_capture_worker():
     try:
         while not stop_event.is_set():
             frame = picam2.capture_array()  # frame is BGR if PICAM_FORMAT=BGR888
-            # store latest frame (overwrite)
-            with shared["frame_lock"]:
-                # Avoid copying if not necessary - but copy to be safe against concurrent use
-                shared["frame"] = frame.copy()
-            # small yield
-            time.sleep(0) 
+            # publish latest frame into a free slot (the only copy per frame);
+            # capture_array blocks until the next frame, so no yield is needed
+            frame_bus.publish(frame, clock.wall())
     except Exception as e:
         print("Camera capture error:", e)
     finally:
+        frame_bus.close()
         try:
             picam2.stop()
         except Exception:
@@ -135,109 +133,69 @@ def camera_capture_worker():
 # --------------------- Detector thread ---------------------
 def detector_worker():
     """
-    Periodically read the latest frame, run detection, update shared['detections'], and enqueue upload payloads.
+    Periodically read the latest frame, run detection, update the tracker, and enqueue upload payloads.
     """
+    last_seq = 0
+    img_rgb = None
     while not stop_event.is_set():
-        # Read latest frame
-        with shared["frame_lock"]:
-            frame = shared["frame"].copy() if shared["frame"] is not None else None
-
-        if frame is None:
-            time.sleep(0.05)
+        # Block until a newer frame exists, then take a reference to it (no copy)
+        ref = frame_bus.wait(last_seq, timeout=0.5)
+        if ref is None:
             continue
 
         # Throttle detection
         detect_start = time.time()
 
-        # Convert to RGB for model (model expects RGB)
-        try:
-            img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        except Exception:
-            # fallback if conversion fails
-            img_rgb = frame.copy()
+        # Convert to RGB for model (model expects RGB) into a reused buffer;
+        # the slot is released as soon as we have our own converted image
+        with ref:
+            last_seq = ref.seq
+            captured_at = ref.timestamp
+            try:
+                if img_rgb is None or img_rgb.shape != ref.array.shape:
+                    img_rgb = np.empty_like(ref.array)
+                cv2.cvtColor(ref.array, cv2.COLOR_BGR2RGB, dst=img_rgb)
+            except Exception:
+                # fallback if conversion fails
+                img_rgb = np.array(ref.array)
 
+        # Motion gate: skip static scenes, crop to localized motion,
+        # periodic full-frame refresh. dets is a structured (cls, conf, bbox) array
         try:
-            results = model.predict(img_rgb, imgsz=320, conf=DETECTION_CONF, verbose=False)
-            r = results[0]
+            dets = gated_detector(img_rgb)
         except Exception as e:
             print("Inference error:", e)
             # Sleep a bit before retrying
             time.sleep(0.1)
             continue
 
-        # Extract boxes, confs, classes robustly
-        boxes_list = []
-        confs_list = []
-        class_list = []
-        if hasattr(r, "boxes") and r.boxes is not None and len(r.boxes) > 0:
-            try:
-                xyxy = r.boxes.xyxy.cpu().numpy()
-                scores = r.boxes.conf.cpu().numpy()
-                cls_idxs = r.boxes.cls.cpu().numpy()
-            except Exception:
-                xyxy = np.array(r.boxes.xyxy)
-                scores = np.array(r.boxes.conf)
-                cls_idxs = np.array(r.boxes.cls)
-
-            # ensure shapes ok
-            if xyxy.ndim == 1 and xyxy.size == 4:
-                xyxy = xyxy.reshape(1, 4)
-
-            n = min(len(xyxy), len(scores), len(cls_idxs))
-            for i in range(n):
-                x1, y1, x2, y2 = xyxy[i].astype(int)
-                # Convert to native Python ints
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                conf = float(scores[i])
-                cls_idx = int(np.array(cls_idxs[i]).item())  # ensure python int
-                name = model_names.get(cls_idx, str(cls_idx))
-                boxes_list.append((x1, y1, x2, y2))
-                confs_list.append(conf)
-                class_list.append(name)
-
-        # Filter allowed classes and prepare upload payload
-        detections = []
-        to_announce = set()
-        for name, conf, bbox in zip(class_list, confs_list, boxes_list):
-            if name not in ALLOWED_CLASSES:
-                continue
-            x1, y1, x2, y2 = bbox
-            detections.append({
-                "name": name,
-                "confidence": float(round(conf, 2)),  # native python float
-                "bbox": [int(x1), int(y1), int(x2), int(y2)]
-            })
-
-            # announcement cooldown
-            last_time = last_announced.get(name, 0)
-            if time.time() - last_time >= ANNOUNCE_COOLDOWN:
-                to_announce.add(name)
-                last_announced[name] = time.time()
-
-        # Update shared detections for preview drawing
-        with shared["detections_lock"]:
-            shared["detections"] = detections  # small list of dicts
+        if dets is None:
+            # nothing moved: previous detections still stand
+            tracker.hold(captured_at)
+            elapsed = time.time() - detect_start
+            if elapsed < DETECTION_INTERVAL:
+                time.sleep(DETECTION_INTERVAL - elapsed)
+            continue
+
+        # Only what the model saw this pass: boxes carried over from outside an ROI crop are held, not re-hit
+        tracks = tracker.update(gated_detector.fresh, captured_at, gated_detector.roi)
+
+        # JSON-ready dicts for the upload payload
+        detections = postprocess.to_records(dets)
+
+        # confirmed tracks not yet announced, closest (largest box) first
+        to_announce = announce_policy.select(tracks, postprocess.labels(tracks), captured_at)
 
         # Trigger TTS non-blocking
         if to_announce:
-            speak_nonblocking(", ".join(sorted(to_announce)) + " detected")
+            speak_nonblocking(", ".join(to_announce) + " detected")
 
-        # Enqueue payload for Firebase upload
+        # Queue payload for the batched Firebase upload
         if detections:
-            ts = datetime.datetime.now(MALAYSIA_TZ).strftime("%Y/%m/%d %H:%M:%S")
+            telemetry_log.log_detections(int(captured_at * 1000), dets)
+            ts = clock.format(captured_at)  # cached per second, only formatted when uploading
             payload = {"timestamp": ts, "objects_detected": detections}
-            try:
-                upload_queue.put_nowait(payload)
-            except queue.Full:
-                # drop oldest then try once
-                try:
-                    _ = upload_queue.get_nowait()
-                except Exception:
-                    pass
-                try:
-                    upload_queue.put_nowait(payload)
-                except Exception:
-                    pass
+            uploader.add(FIREBASE_ROOT, payload)
 
         # Respect detection interval (sleep remaining time if any)
         elapsed = time.time() - detect_start
@@ -245,20 +203,10 @@ def detector_worker():
             time.sleep(DETECTION_INTERVAL - elapsed)
 
 # --------------------- Uploader thread ---------------------
-def uploader_worker():
-    while not stop_event.is_set() or not upload_queue.empty():
-        try:
-            payload = upload_queue.get(timeout=0.5)
-        except queue.Empty:
-            continue
-        try:
-            # Ensure payload contains only JSON-serializable native types (we already converted)
-            root.push(payload)
-            print(f"[{payload['timestamp']}] uploaded {len(payload['objects_detected'])} objects")
-        except Exception as e:
-            print("Firebase upload error:", e)
-        finally:
-            upload_queue.task_done()
+# pending payloads wait in a durable SQLite outbox and go out as one
+# multi-path update() per UPLOAD_FLUSH_MS (with backoff while offline)
+uploader = BatchUploader(root, flush_ms=UPLOAD_FLUSH_MS, max_records=UPLOAD_BATCH_MAX,
+                         outbox=Outbox(max_bytes=OUTBOX_MAX_BYTES))
 
 # --------------------- Preview (main thread) ---------------------
 def preview_loop():
@@ -269,25 +217,31 @@ def preview_loop():
 
     fps_t0 = time.time()
     frames_shown = 0
+    last_seq = 0
+    frame = None  # reused drawing buffer
 
     try:
         while not stop_event.is_set():
-            with shared["frame_lock"]:
-                frame = shared["frame"].copy() if shared["frame"] is not None else None
-
-            if frame is None:
-                time.sleep(0.01)
+            ref = frame_bus.wait(last_seq, timeout=0.1)
+            if ref is None:
+                if SHOW_WINDOW:
+                    # keep the GUI responsive while the camera is stalled
+                    cv2.waitKey(1)
                 continue
 
-            # draw last detections
-            with shared["detections_lock"]:
-                detections = list(shared["detections"])
+            # we draw on the frame, so copy into our own buffer (no allocation)
+            with ref:
+                last_seq = ref.seq
+                if frame is None or frame.shape != ref.array.shape:
+                    frame = np.empty_like(ref.array)
+                np.copyto(frame, ref.array)
 
-            for obj in detections:
-                x1, y1, x2, y2 = obj.get("bbox", [0,0,0,0])
-                name = obj.get("name", "")
-                conf = obj.get("confidence", 0.0)
-                label = f"{name} {conf:.2f}"
+            # draw tracks predicted to this frame's capture time
+            tracks = tracker.boxes_at(ref.timestamp)
+
+            for track, name in zip(tracks, postprocess.labels(tracks).tolist()):
+                x1, y1, x2, y2 = track["bbox"]
+                label = f"#{track['id']} {name} {track['conf']:.2f}"
                 cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
                 cv2.putText(frame, label, (int(x1), max(int(y1)-6, 8)),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0,255,0), 1, cv2.LINE_AA)
@@ -320,27 +274,22 @@ def preview_loop():
 def shutdown():
     print("Shutting down...")
     stop_event.set()
+    frame_bus.close()
 
     # let uploader drain briefly
     try:
-        uploader_thread.join(timeout=3.0)
+        uploader.stop(timeout=3.0)
     except Exception:
         pass
 
-    # stop TTS thread
-    try:
-        tts_queue.put_nowait(None)
-    except Exception:
-        pass
     try:
-        tts_thread.join(timeout=1.0)
+        telemetry_log.close()
     except Exception:
         pass
 
-    # pyttsx3 engine cleanup if used
+    # stop TTS thread (interrupts anything still speaking)
     try:
-        if use_pyttsx3 and tts_engine is not None:
-            tts_engine.stop()
+        speech.stop(timeout=1.0)
     except Exception:
         pass
 
@@ -349,11 +298,10 @@ def shutdown():
 # --------------------- Start threads ---------------------
 camera_thread = threading.Thread(target=camera_capture_worker, daemon=True)
 detector_thread = threading.Thread(target=detector_worker, daemon=True)
-uploader_thread = threading.Thread(target=uploader_worker, daemon=True)
 
 camera_thread.start()
 detector_thread.start()
-uploader_thread.start()
+uploader.start()
 
 # Main preview loop runs in main thread to keep GUI responsive and allow keyboard interrupt
 try:
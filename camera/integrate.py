@@ -1,130 +1,125 @@
-import RPi.GPIO as GPIO
+import os
+import sys
 import time
-import datetime
-from zoneinfo import ZoneInfo
 import cv2
-from ultralytics import YOLO
 from picamera2 import Picamera2
-import numpy as np
-import queue
 import threading
-import subprocess
 import firebase_admin
 from firebase_admin import credentials, db
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project_root"))
+from gpio_backend import get_backend
+from ranging import EdgeTimedSensor
+from inference_worker import InferenceWorker
+from detection_post import DetectionPostprocessor
+from inference_backend import load_detector
+from motion_gate import GatedDetector, MotionGate
+from tracker import Tracker
+from announce_policy import AnnouncementPolicy
+from fusion import HazardFusion
+from firebase_batch import BatchUploader
+from outbox import Outbox
+from local_rtdb import LocalRealtimeDB
+from telemetry_encoder import DeadbandEncoder
+from telemetry_log import TelemetryLog
+from clock import clock
+from sound_speed import DistanceConverter, FixedTemperature
+from speech import SpeechScheduler
+from phrase_cache import alert_vocabulary, make_speaker, preload_vocabulary
+
 # ========================================
 # FIREBASE SETUP
 # ========================================
-cred = credentials.Certificate("/home/coe/firebase/firebase-key.json")
-firebase_admin.initialize_app(cred, {
-    "databaseURL": "https://sidp-5fcae-default-rtdb.asia-southeast1.firebasedatabase.app/"
-})
-ultrasonic_db = db.reference("ultrasonicDB")
-object_db = db.reference("objectDetectionDB")
-print("Firebase initialized successfully!")
+if os.environ.get("SIDP_FIREBASE") == "local":
+    # In-process stand-in (no network/credentials), e.g. for bench tests
+    firebase_root = LocalRealtimeDB(os.environ.get("SIDP_FIREBASE_FILE")).reference("/")
+    print("Using local Realtime Database stand-in")
+else:
+    cred = credentials.Certificate("/home/coe/firebase/firebase-key.json")
+    firebase_admin.initialize_app(cred, {
+        "databaseURL": "https://sidp-5fcae-default-rtdb.asia-southeast1.firebasedatabase.app/"
+    })
+    firebase_root = db.reference("/")
+    print("Firebase initialized successfully!")
+
+# Shared clock: cheap (monotonic, wall) stamps, Malaysian time strings
+# formatted only when a record is uploaded (and cached per second)
+malaysia_tz = clock.tz
 
-malaysia_tz = ZoneInfo("Asia/Kuala_Lumpur")
+# Full-resolution local log in packed binary (one file per day); roll up
+# finished days to .npz/Parquet with `python telemetry_log.py rollup`
+telemetry_log = TelemetryLog(tz=malaysia_tz)
 
 # ========================================
-# THREADED FIREBASE UPLOADER
+# BATCHED FIREBASE UPLOADER
 # ========================================
-firebase_queue = queue.Queue(maxsize=100)
-
-def firebase_worker():
-    """Background thread for non-blocking Firebase uploads"""
-    while True:
-        try:
-            upload_type, data = firebase_queue.get(timeout=1)
-            if upload_type is None:
-                break
-            
-            if upload_type == "ultrasonic":
-                ultrasonic_db.push(data)
-            elif upload_type == "objects":
-                object_db.push(data)
-            
-            firebase_queue.task_done()
-        except queue.Empty:
-            continue
-        except Exception as e:
-            print(f"Firebase upload error: {e}")
-            try:
-                firebase_queue.task_done()
-            except:
-                pass
-
-firebase_thread = threading.Thread(target=firebase_worker, daemon=True)
-firebase_thread.start()
+# Records are coalesced into one multi-path update() every 500 ms (or 50
+# records) instead of one push() round trip each. They wait in an on-disk
+# outbox (SQLite, 50 MB cap), so nothing is lost while offline or across
+# restarts; failed uploads retry with backoff up to 60 s apart
+FIREBASE_PATHS = {
+    "ultrasonic": "ultrasonicDB",
+    "objects": "objectDetectionDB",
+}
+firebase_uploader = BatchUploader(firebase_root, flush_ms=500, max_records=50,
+                                  outbox=Outbox(max_bytes=50 * 1024 * 1024)).start()
 
 def upload_to_firebase(upload_type, data):
-    """Queue data for background Firebase upload"""
-    try:
-        firebase_queue.put_nowait((upload_type, data))
-    except queue.Full:
-        print("Firebase queue full, skipping upload")
+    """Queue data for background Firebase upload (never blocks)"""
+    firebase_uploader.add(FIREBASE_PATHS[upload_type], data)
 
 # ========================================
 # UNIFIED TTS SYSTEM (Threaded, Non-blocking)
 # ========================================
-tts_queue = queue.PriorityQueue()
-use_pyttsx3 = False
-engine = None
+# One speaking thread with preemption: "Stop" interrupts a lower-priority
+# announcement, a newer range alert replaces a queued one (key="range"),
+# and anything not started within 2 s is dropped as stale.
+# Alerts play from pre-rendered PCM through one persistent audio sink
+# (no espeak fork per alert); class phrases are added once the model is loaded
+speech = SpeechScheduler(make_speaker(alert_vocabulary()), max_age_s=2.0).start()
 
-try:
-    import pyttsx3
-    engine = pyttsx3.init()
-    engine.setProperty("rate", 150)
-    engine.setProperty("volume", 1.0)
-    use_pyttsx3 = True
-    print("Using pyttsx3 for TTS")
-except Exception:
-    use_pyttsx3 = False
-    print("Using espeak for TTS")
+def speak(text, priority=5, key=None):
+    """Queue text for speech (lower priority number = more urgent)"""
+    speech.say(text, priority=priority, key=key)
 
-def tts_worker():
-    """Background thread that handles all TTS announcements"""
-    while True:
-        try:
-            priority, text = tts_queue.get(timeout=1)
-            if text is None:
-                tts_queue.task_done()
-                break
-            
-            if use_pyttsx3 and engine is not None:
-                engine.say(text)
-                engine.runAndWait()
-            else:
-                subprocess.run(["espeak", text], check=False)
-            
-            tts_queue.task_done()
-        except queue.Empty:
-            continue
-        except Exception as e:
-            print(f"TTS error: {e}")
-            try:
-                tts_queue.task_done()
-            except:
-                pass
+# ========================================
+# OBJECT TRACKS + RANGE FUSION
+# ========================================
+# Tracks carry boxes between inference frames: the display loop draws every
+# track extrapolated to the current frame instead of the last (stale) result
+tracker = Tracker(iou_threshold=0.3, max_age_s=1.0)
 
-tts_thread = threading.Thread(target=tts_worker, daemon=True)
-tts_thread.start()
+def track_labels(tracks):
+    # postprocess exists once the model is loaded; there are no tracks before that
+    return postprocess.labels(tracks)
 
-def speak(text, priority=5):
-    """Add text to TTS queue with priority"""
-    tts_queue.put((priority, text))
+# Range alerts name the object straight ahead ("Warning, chair, 80 centimetres")
+# and all speech goes through this one prioritised stream
+fusion = HazardFusion(tracker, track_labels, speak, frame_width=640)
 
 # ========================================
 # ULTRASONIC SENSOR SETUP
 # ========================================
-GPIO.setmode(GPIO.BOARD)
+backend = get_backend()
 TRIG = 11
 ECHO = 12
+MAX_RANGE_CM = 200          # farthest alert threshold; echo timeout derives from it
+AMBIENT_TEMP_C = 30.0       # outdoor Malaysia; swap FixedTemperature for a sensor source
+AMBIENT_HUMIDITY = 80.0
 
-GPIO.setup(TRIG, GPIO.OUT)
-GPIO.setup(ECHO, GPIO.IN)
-GPIO.output(TRIG, False)
+# Edge-triggered ranging: echo timing runs off GPIO interrupts, so this thread
+# no longer spins a core and starves the YOLO loop
+converter = DistanceConverter(FixedTemperature(AMBIENT_TEMP_C, AMBIENT_HUMIDITY))
+sensor = EdgeTimedSensor(backend, TRIG, ECHO, max_range_cm=MAX_RANGE_CM, converter=converter)
 time.sleep(0.1)
 
+BAND_COLORS = {
+    "Stop": (0, 0, 255),
+    "Warning": (0, 165, 255),
+    "Caution": (0, 255, 255),
+    "Clear": (0, 255, 0),
+}
+
 ultrasonic_data = {
     "distance": 0,
     "message": "Initializing...",
@@ -136,40 +131,23 @@ ultrasonic_lock = threading.Lock()
 def measure_distance():
     """Measure distance from HC-SR04 sensor with timeout protection"""
     try:
-        GPIO.output(TRIG, True)
-        time.sleep(0.00001)
-        GPIO.output(TRIG, False)
-
-        pulse_start = time.time()
-        pulse_end = time.time()
-        timeout = time.time() + 0.1
-
-        while GPIO.input(ECHO) == 0:
-            pulse_start = time.time()
-            if pulse_start > timeout:
-                return None
-
-        while GPIO.input(ECHO) == 1:
-            pulse_end = time.time()
-            if pulse_end > timeout:
-                return None
-
-        pulse_duration = pulse_end - pulse_start
-        distance = pulse_duration * 17150
-        return round(distance, 2)
+        return sensor.measure_distance()
     except Exception as e:
         print(f"Ultrasonic error: {e}")
         return None
 
 def ultrasonic_worker():
     """Background thread for continuous ultrasonic monitoring"""
-    last_message = None
-    last_announce_time = 0
-    announce_interval = 3.0
-    
+    # Upload on band change, a 10 cm move, or a 60 s heartbeat (with window min/max/mean)
+    telemetry = DeadbandEncoder(delta_cm=10.0, heartbeat_s=60.0)
     while True:
+        converter.maybe_refresh()
         distance = measure_distance()
-        current_time = time.time()
+        current_time = clock.wall()
+        
+        # Echo started but outlasted the range-derived timeout: nothing within range
+        if distance is None and sensor.out_of_range:
+            distance = float(MAX_RANGE_CM)
         
         if distance is None:
             with ultrasonic_lock:
@@ -179,22 +157,9 @@ def ultrasonic_worker():
             time.sleep(0.2)
             continue
         
-        if distance < 50:
-            message = "Stop"
-            color = (0, 0, 255)
-            priority = 1
-        elif distance < 100:
-            message = "Warning"
-            color = (0, 165, 255)
-            priority = 2
-        elif distance < 200:
-            message = "Caution"
-            color = (0, 255, 255)
-            priority = 3
-        else:
-            message = "Clear"
-            color = (0, 255, 0)
-            priority = 5
+        # Band + spoken alert (with the object ahead, if the camera sees one)
+        message, priority = fusion.on_range(distance, current_time)
+        color = BAND_COLORS[message]
         
         with ultrasonic_lock:
             ultrasonic_data["distance"] = distance
@@ -202,23 +167,13 @@ def ultrasonic_worker():
             ultrasonic_data["color"] = color
             ultrasonic_data["last_update"] = current_time
         
-        if message != "Clear":
-            if message != last_message or (current_time - last_announce_time) > announce_interval:
-                speak(message, priority=priority)
-                last_message = message
-                last_announce_time = current_time
-        else:
-            last_message = None
+        telemetry_log.log_range(int(current_time * 1000), distance, message)
         
-        # Non-blocking Firebase upload
-        now = datetime.datetime.now(malaysia_tz)
-        timestamp = now.strftime("%Y/%m/%d %H:%M:%S")
-        firebase_data = {
-            "timestamp": timestamp,
-            "distance_cm": distance,
-            "message": message
-        }
-        upload_to_firebase("ultrasonic", firebase_data)
+        # Non-blocking Firebase upload, only when something changed
+        firebase_data = telemetry.offer(distance, message, current_time)
+        if firebase_data is not None:
+            firebase_data["timestamp"] = clock.format(current_time)
+            upload_to_firebase("ultrasonic", firebase_data)
         
         time.sleep(1.0)
 
@@ -228,13 +183,19 @@ ultrasonic_thread.start()
 # ========================================
 # YOLO + CAMERA SETUP
 # ========================================
-model = YOLO("yolov8n.pt")
+# Fastest available CPU backend (NCNN/OpenVINO/ONNX/PyTorch), warmed up before the camera starts
+model, model_backend = load_detector("yolov8n.pt", imgsz=320)
 allowed_classes = {
     'person', 'car', 'cat', 'dog', 'stop sign',
     'toilet', 'chair', 'bed', 'tv', 'dining table'
 }
-ANNOUNCE_COOLDOWN = 5.0
-last_announced = {}
+preload_vocabulary(speech.speaker, alert_vocabulary(allowed_classes))
+# A track is spoken once it has been seen in 3 inference frames; the same
+# track is repeated only after 30 s, new objects of a known class are not muted
+announce_policy = AnnouncementPolicy(confirm_hits=3, repeat_s=30.0)
+
+# Allowed-class mask and name table are built once; per-frame filtering is pure NumPy
+postprocess = DetectionPostprocessor(model.names, allowed_classes)
 
 picam2 = Picamera2()
 config = picam2.create_preview_configuration(
@@ -244,21 +205,49 @@ picam2.configure(config)
 picam2.start()
 print("Camera started. Press 'q' to quit")
 
+# ========================================
+# ASYNC YOLO INFERENCE (dedicated thread, newest frame wins)
+# ========================================
+def run_yolo(frame):
+    return model.predict(frame, imgsz=320, conf=0.35, classes=postprocess.class_ids, verbose=False)[0]
+
+# Motion gate: skip inference on static scenes, crop to localized motion,
+# full-frame refresh every 2 s
+gated_detector = GatedDetector(run_yolo, postprocess, MotionGate(full_refresh_s=2.0))
+
+def handle_detections(frame_id, frame, dets, captured_at):
+    """Runs in the inference thread for every finished frame"""
+    # None = nothing moved, the tracked boxes still stand
+    if dets is None:
+        tracker.hold(captured_at)
+        return
+    # Only what the model saw this pass: boxes carried over from outside an ROI crop are held, not re-hit
+    tracks = tracker.update(gated_detector.fresh, captured_at, gated_detector.roi)
+    
+    # Announcement logic (confirmed new tracks, closest first)
+    fusion.announce(announce_policy, tracks, postprocess.labels(tracks), captured_at)
+    
+    if len(dets) > 0:
+        telemetry_log.log_detections(int(captured_at * 1000), dets)
+        
+        # Non-blocking Firebase upload
+        data = {
+            "timestamp": clock.format(captured_at),
+            "objects_detected": postprocess.to_records(dets)
+        }
+        upload_to_firebase("objects", data)
+
+# Frames are stamped with the shared clock, like the range readings fusion pairs them with
+inference = InferenceWorker(gated_detector, handle_detections, now=clock.wall)
+inference.start()
+
 # FPS tracking (updates every second)
 fps = 0.0
 fps_counter = 0
 fps_start_time = time.time()
 
-# Skip-frame optimization
-frame_skip = 3  # Run YOLO every 2nd frame
-frame_count = 0
-last_boxes = []
-last_detected_names = []
-last_confs = []
-last_keep_idx = []
-
 # ========================================
-# MAIN LOOP
+# MAIN LOOP (capture + display only, never waits for YOLO)
 # ========================================
 try:
     while True:
@@ -266,111 +255,24 @@ try:
         frame = picam2.capture_array()
         frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
         
-        frame_count += 1
-        run_yolo = (frame_count % frame_skip == 0)
+        # Hand the frame to the inference thread; draw on a separate copy
+        # so the model never sees our overlays
+        inference.submit(frame)
+        display = frame.copy()
         
         # ========================================
-        # YOLO INFERENCE (every Nth frame)
+        # DRAW BOUNDING BOXES (tracks predicted to this frame)
         # ========================================
-        if run_yolo:
-            results = model.predict(frame, imgsz=320, conf=0.35, verbose=False)
-            r = results[0]
-            
-            try:
-                cls_array = r.boxes.cls.cpu().numpy()
-                boxes = r.boxes.xyxy.cpu().numpy()
-                confs = r.boxes.conf.cpu().numpy()
-            except Exception:
-                cls_array = np.array(r.boxes.cls)
-                boxes = np.array(r.boxes.xyxy)
-                confs = np.array(r.boxes.conf)
-            
-            cls_array = np.atleast_1d(np.array(cls_array).squeeze())
-            confs = np.atleast_1d(np.array(confs).squeeze())
-            boxes = np.array(boxes)
-            if boxes.ndim == 1 and boxes.size == 4:
-                boxes = boxes.reshape(1, 4)
-            
-            n = min(boxes.shape[0], cls_array.shape[0], confs.shape[0])
-            
-            detected_names = []
-            firebase_objects = []
-            
-            if n > 0:
-                boxes = boxes[:n]
-                cls_array = cls_array[:n]
-                confs = confs[:n]
-                
-                for c in cls_array:
-                    idx = int(c)
-                    if isinstance(model.names, dict):
-                        name = model.names.get(idx, str(idx))
-                    else:
-                        name = model.names[idx]
-                    detected_names.append(name)
-                
-                keep_idx = [i for i, name in enumerate(detected_names) if name in allowed_classes]
-                
-                # Announcement logic
-                announced_this_frame = set()
-                for i in keep_idx:
-                    name = detected_names[i]
-                    if name not in announced_this_frame:
-                        last_time = last_announced.get(name, 0)
-                        if (time.time() - last_time) >= ANNOUNCE_COOLDOWN:
-                            announced_this_frame.add(name)
-                            last_announced[name] = time.time()
-                
-                if announced_this_frame:
-                    announcement = ", ".join(announced_this_frame) + " detected"
-                    speak(announcement, priority=5)
-                
-                # Prepare Firebase data
-                for i in keep_idx:
-                    x1, y1, x2, y2 = boxes[i].astype(int)
-                    conf = float(confs[i])
-                    name = detected_names[i]
-                    firebase_objects.append({
-                        "name": name,
-                        "confidence": round(conf, 2),
-                        "bbox": [int(x1), int(y1), int(x2), int(y2)]
-                    })
-                
-                # Non-blocking Firebase upload
-                if firebase_objects:
-                    now = datetime.datetime.now(malaysia_tz)
-                    timestamp = now.strftime("%Y/%m/%d %H:%M:%S")
-                    data = {
-                        "timestamp": timestamp,
-                        "objects_detected": firebase_objects
-                    }
-                    upload_to_firebase("objects", data)
-                
-                # Cache results for skipped frames
-                last_boxes = boxes
-                last_detected_names = detected_names
-                last_confs = confs
-                last_keep_idx = keep_idx
-            else:
-                # No detections
-                last_boxes = []
-                last_detected_names = []
-                last_confs = []
-                last_keep_idx = []
+        # Same clock as the frame timestamps and range readings the tracker sees
+        tracks = tracker.boxes_at(clock.wall())
         
-        # ========================================
-        # DRAW BOUNDING BOXES (use cached results on skipped frames)
-        # ========================================
-        if len(last_keep_idx) > 0:
-            for i in last_keep_idx:
-                x1, y1, x2, y2 = last_boxes[i].astype(int)
-                conf = float(last_confs[i])
-                name = last_detected_names[i]
-                label = f"{name} {conf:.2f}"
-                
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(frame, label, (x1, max(y1 - 8, 10)),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+        for track, name in zip(tracks, postprocess.labels(tracks).tolist()):
+            x1, y1, x2, y2 = (int(v) for v in track["bbox"])
+            label = f"#{track['id']} {name} {track['conf']:.2f}"
+            
+            cv2.rectangle(display, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(display, label, (x1, max(y1 - 8, 10)),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
         
         # ========================================
         # OVERLAY ULTRASONIC DATA
@@ -386,9 +288,9 @@ try:
         #cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
         
         # Display ultrasonic info
-        cv2.putText(frame, f"Distance: {distance:.1f} cm", (10, 25),
+        cv2.putText(display, f"Distance: {distance:.1f} cm", (10, 25),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        cv2.putText(frame, f"Status: {message}", (10, 50),
+        cv2.putText(display, f"Status: {message}", (10, 50),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
         #cv2.rectangle(frame, (10, 55), (310, 65), color, -1)
         
@@ -403,11 +305,11 @@ try:
             fps_start_time = current_time
         
         # Display FPS
-        cv2.putText(frame, f"FPS: {fps:.1f}", (10, 90),
+        cv2.putText(display, f"FPS: {fps:.1f}  Det age: {inference.age * 1000:.0f} ms", (10, 90),
             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
         
         # Show frame
-        cv2.imshow("Vision Assistance System", frame)
+        cv2.imshow("Vision Assistance System", display)
         
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
@@ -418,6 +320,11 @@ except KeyboardInterrupt:
 finally:
     print("Shutting down...")
     
+    try:
+        inference.stop()
+    except Exception:
+        pass
+    
     try:
         picam2.stop()
     except Exception:
@@ -429,26 +336,24 @@ finally:
         pass
     
     try:
-        GPIO.cleanup()
+        sensor.close()
+        backend.cleanup()
     except Exception:
         pass
     
     try:
-        firebase_queue.put((None, None))
-        firebase_thread.join(timeout=2)
+        firebase_uploader.stop(timeout=2)
     except Exception:
         pass
     
     try:
-        tts_queue.put((0, None))
-        tts_thread.join(timeout=2)
+        telemetry_log.close()
     except Exception:
         pass
     
-    if use_pyttsx3 and engine is not None:
-        try:
-            engine.stop()
-        except Exception:
-            pass
+    try:
+        speech.stop(timeout=2)
+    except Exception:
+        pass
     
     print("Exited cleanly")
@@ -0,0 +1,45 @@
+import numpy as np
+
+# ========================================
+# TRACK-BASED ANNOUNCEMENT POLICY
+# ========================================
+# Announcements are per track id, not per class name: a second chair that
+# walks into view is a new track and gets announced, while one chair that
+# stays in view is announced once (and again only after repeat_s).
+# A track must be matched in confirm_hits inference frames before it is
+# spoken, so one-frame false positives and flicker never reach TTS.
+# When several tracks are due, the biggest boxes (closest objects) go first
+# and at most max_items are spoken at once; the rest stay due for the next call.
+
+
+class AnnouncementPolicy:
+    def __init__(self, confirm_hits=3, repeat_s=30.0, max_items=3):
+        self.confirm_hits = confirm_hits
+        self.repeat_s = repeat_s
+        self.max_items = max_items
+        self._announced = {}        # track id -> time last announced
+
+    def select(self, tracks, labels, now):
+        """
+        tracks: TRACK_DTYPE array from Tracker.update(); labels: class name per
+        track. Returns the class names to announce now, closest first.
+        """
+        live = set(tracks["id"].tolist())
+        # Forget tracks the tracker dropped so the dict cannot grow
+        self._announced = {tid: t for tid, t in self._announced.items() if tid in live}
+
+        due = np.flatnonzero(tracks["hits"] >= self.confirm_hits)
+        due = [
+            i for i in due
+            if now - self._announced.get(int(tracks["id"][i]), -np.inf) >= self.repeat_s
+        ]
+        if not due:
+            return []
+
+        boxes = tracks["bbox"][due].astype(np.int32)
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        picked = [due[j] for j in np.argsort(-area, kind="stable")[:self.max_items]]
+        for i in picked:
+            self._announced[int(tracks["id"][i])] = now
+        # One mention per class: "chair, person detected", not "chair, chair, ..."
+        return list(dict.fromkeys(labels[i] for i in picked))
@@ -0,0 +1,86 @@
+import argparse
+import itertools
+import statistics
+import time
+
+from gpio_backend import SimulatedGPIOBackend
+from ranging import EdgeTimedSensor, RangingScheduler
+
+# ========================================
+# RANGING BENCHMARK (simulated GPIO)
+# ========================================
+# Reproducible throughput / latency / CPU numbers for the ranging stack on
+# any Linux box. Example:
+#   python bench_ranging.py --sensors 4 --rate 40 --seconds 5 --realtime
+
+
+def make_sensors(backend, count, distance_cm, noise_cm, dropout, latency_s, max_range_cm):
+    sensors = []
+    for i in range(count):
+        trig, echo = 100 + 2 * i, 101 + 2 * i
+        backend.attach_echo(trig, echo, itertools.repeat(distance_cm),
+                            latency_s=latency_s, noise_cm=noise_cm, dropout=dropout)
+        sensors.append(EdgeTimedSensor(backend, trig, echo, max_range_cm=max_range_cm))
+    return sensors
+
+
+def bench_single(sensor, pings):
+    """Per-ping wall latency of back-to-back pings on one sensor."""
+    latencies = []
+    for _ in range(pings):
+        t0 = time.perf_counter_ns()
+        sensor.measure_distance()
+        latencies.append((time.perf_counter_ns() - t0) / 1e6)
+    return latencies
+
+
+def bench_scheduler(sensors, rate_hz, seconds):
+    """Aggregate pings/s and CPU share of the scheduler thread plus callbacks."""
+    scheduler = RangingScheduler(sensors, rate_hz=rate_hz)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    scheduler.start()
+    time.sleep(seconds)
+    scheduler.stop()
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    # The ring only keeps the last `size` readings: count from the sequence
+    # number, and take the valid share from what is still buffered
+    readings = scheduler.ring.since(0)
+    valid = sum(1 for r in readings if r.distance is not None)
+    return scheduler.ring.total / wall, valid / max(len(readings), 1), cpu / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HC-SR04 ranging on the simulated backend")
+    parser.add_argument("--sensors", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=40.0, help="aggregate Hz, 0 = free-running")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--pings", type=int, default=200)
+    parser.add_argument("--distance", type=float, default=120.0)
+    parser.add_argument("--noise", type=float, default=1.0)
+    parser.add_argument("--dropout", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.0005)
+    parser.add_argument("--max-range", type=float, default=200.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--realtime", action="store_true", help="deliver edges at simulated time")
+    args = parser.parse_args()
+
+    backend = SimulatedGPIOBackend(seed=args.seed, realtime=args.realtime)
+    sensors = make_sensors(backend, args.sensors, args.distance, args.noise,
+                           args.dropout, args.latency, args.max_range)
+
+    latencies = bench_single(sensors[0], args.pings)
+    print(f"single sensor: {args.pings} pings, "
+          f"median {statistics.median(latencies):.3f} ms, max {max(latencies):.3f} ms")
+
+    rate, valid, cpu = bench_scheduler(sensors, args.rate or None, args.seconds)
+    print(f"scheduler: {len(sensors)} sensors, {rate:.1f} pings/s, "
+          f"{valid:.0%} valid, CPU {cpu:.1%} of one core")
+
+    for sensor in sensors:
+        sensor.close()
+    backend.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import datetime
+import threading
+import time
+from collections import namedtuple
+from zoneinfo import ZoneInfo
+
+# ========================================
+# SHARED CLOCK SERVICE
+# ========================================
+# datetime.now(tz).strftime(...) costs several microseconds (tz lookup,
+# object allocation, formatting) and was called per reading and per frame.
+# Clock hands out (monotonic, wall epoch) pairs from a single
+# time.monotonic() call plus an offset, and formats display strings only
+# when asked, reusing the cached string while the second has not changed.
+#
+# The Pi has no RTC, so wall time can jump when NTP syncs after boot; the
+# offset is re-checked against time.time() every resync_s and re-anchored
+# if it drifted by more than max_drift_s.
+#
+# Microbenchmark: python clock.py
+
+TIMESTAMP_FORMAT = "%Y/%m/%d %H:%M:%S"
+MALAYSIA_TZ = ZoneInfo("Asia/Kuala_Lumpur")
+
+Stamp = namedtuple("Stamp", ["mono", "wall"])
+
+
+class Clock:
+    def __init__(self, tz=None, fmt=TIMESTAMP_FORMAT, resync_s=5.0, max_drift_s=0.5):
+        self.tz = tz
+        self.fmt = fmt
+        self.resync_s = resync_s
+        self.max_drift_s = max_drift_s
+        self._lock = threading.Lock()
+        self._anchor()
+        self._cached = (None, "")          # (epoch second, text), swapped as one object
+
+    def _anchor(self):
+        mono = time.monotonic()
+        self._offset = time.time() - mono
+        self._next_check = mono + self.resync_s
+
+    def now(self):
+        """Stamp(mono, wall) for this instant."""
+        mono = time.monotonic()
+        if mono >= self._next_check:
+            with self._lock:
+                drift = time.time() - (mono + self._offset)
+                if abs(drift) > self.max_drift_s:
+                    self._anchor()
+                else:
+                    self._next_check = mono + self.resync_s
+        return Stamp(mono, mono + self._offset)
+
+    def wall(self):
+        """Epoch seconds, like time.time()."""
+        return self.now().wall
+
+    def epoch_ms(self, wall=None):
+        return int((self.wall() if wall is None else wall) * 1000)
+
+    def format(self, wall=None):
+        """Display string for an epoch (default: now); formatted once per second."""
+        second = int(self.wall() if wall is None else wall)
+        # One read of the tuple: another thread may replace it between two attribute reads
+        cached_second, text = self._cached
+        if second != cached_second:
+            text = datetime.datetime.fromtimestamp(second, self.tz).strftime(self.fmt)
+            self._cached = (second, text)
+        return text
+
+
+# Shared instance: every script reports Malaysian local time
+clock = Clock(MALAYSIA_TZ)
+
+
+def _bench(n=200_000):
+    def per_call_ns(fn):
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter_ns() - t0) / n
+
+    old = per_call_ns(lambda: datetime.datetime.now(MALAYSIA_TZ).strftime(TIMESTAMP_FORMAT))
+    stamp = per_call_ns(clock.now)
+    stamp_fmt = per_call_ns(lambda: clock.format(clock.now().wall))
+    print(f"datetime.now(tz).strftime : {old:8.0f} ns/call")
+    print(f"clock.now()               : {stamp:8.0f} ns/call")
+    print(f"clock.format(now)         : {stamp_fmt:8.0f} ns/call")
+    print(f"per-frame saving          : {old - stamp:8.0f} ns ({old / stamp:.0f}x) "
+          f"when formatting is deferred to upload")
+
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,100 @@
+import numpy as np
+
+# ========================================
+# VECTORIZED DETECTION POST-PROCESSING
+# ========================================
+# Turns a YOLO result into a compact structured array in a handful of NumPy
+# ops: class filtering uses a boolean mask indexed by class id (built once),
+# and thresholding, rounding and int-casting are array operations, so the
+# per-frame Python overhead does not grow with the number of boxes.
+#
+# class_ids is meant to be passed to model.predict(classes=...) so NMS and
+# post-processing never see the ~70 COCO classes we would throw away; the
+# mask still guards against models that ignore the filter.
+
+DETECTION_DTYPE = np.dtype([
+    ("cls", np.int16),
+    ("conf", np.float32),
+    ("bbox", np.int16, (4,)),   # x1, y1, x2, y2 in pixels
+])
+
+
+def result_arrays(r):
+    """(cls, conf, xyxy) numpy arrays from an ultralytics result, shape-normalised."""
+    boxes = getattr(r, "boxes", None)
+    if boxes is None or len(boxes) == 0:
+        return np.empty(0), np.empty(0), np.empty((0, 4))
+    try:
+        cls = boxes.cls.cpu().numpy()
+        conf = boxes.conf.cpu().numpy()
+        xyxy = boxes.xyxy.cpu().numpy()
+    except Exception:
+        cls = np.array(boxes.cls)
+        conf = np.array(boxes.conf)
+        xyxy = np.array(boxes.xyxy)
+
+    cls = np.atleast_1d(cls.squeeze())
+    conf = np.atleast_1d(conf.squeeze())
+    xyxy = xyxy.reshape(-1, 4)
+    n = min(len(cls), len(conf), len(xyxy))
+    return cls[:n], conf[:n], xyxy[:n]
+
+
+def allowed_class_ids(names, allowed_classes):
+    """Sorted class ids of the model whose names are in allowed_classes."""
+    if not isinstance(names, dict):
+        names = dict(enumerate(names))
+    missing = set(allowed_classes) - set(names.values())
+    if missing:
+        print(f"Warning: classes not in model: {', '.join(sorted(missing))}")
+    return sorted(idx for idx, name in names.items() if name in allowed_classes)
+
+
+class DetectionPostprocessor:
+    """Filters YOLO results to allowed classes and packs them as DETECTION_DTYPE."""
+
+    def __init__(self, names, allowed_classes, conf_threshold=0.0):
+        if not isinstance(names, dict):
+            names = dict(enumerate(names))
+        self.names = names
+        num_classes = max(names) + 1 if names else 0
+
+        # Lookup tables indexed by class id, built once at startup
+        self.allowed_mask = np.zeros(num_classes, dtype=bool)
+        self.name_table = np.array([names.get(i, str(i)) for i in range(num_classes)], dtype=object)
+        self.class_ids = allowed_class_ids(names, allowed_classes)
+        self.allowed_mask[self.class_ids] = True
+        self.conf_threshold = conf_threshold
+
+    def __call__(self, r):
+        cls, conf, xyxy = result_arrays(r)
+        cls_ids = cls.astype(np.intp)
+
+        in_range = (cls_ids >= 0) & (cls_ids < len(self.allowed_mask))
+        keep = np.zeros(len(cls_ids), dtype=bool)
+        keep[in_range] = self.allowed_mask[cls_ids[in_range]]
+        keep &= conf >= self.conf_threshold
+
+        dets = np.empty(int(keep.sum()), dtype=DETECTION_DTYPE)
+        dets["cls"] = cls_ids[keep]
+        dets["conf"] = np.round(conf[keep], 2)
+        dets["bbox"] = xyxy[keep].astype(np.int16)
+        return dets
+
+    def labels(self, dets):
+        """Class name per detection (object array)."""
+        return self.name_table[dets["cls"]]
+
+    def class_names(self, dets):
+        """Sorted unique class names present in dets."""
+        return sorted(self.name_table[np.unique(dets["cls"])].tolist())
+
+    def to_records(self, dets):
+        """JSON-ready list of {"name", "confidence", "bbox"} dicts for upload."""
+        names = self.labels(dets).tolist()
+        confs = dets["conf"].astype(float).round(2).tolist()
+        bboxes = dets["bbox"].tolist()
+        return [
+            {"name": name, "confidence": conf, "bbox": bbox}
+            for name, conf, bbox in zip(names, confs, bboxes)
+        ]
@@ -0,0 +1,171 @@
+import random
+import sqlite3
+import threading
+import time
+
+from outbox import MemoryOutbox
+
+# ========================================
+# BATCHED FIREBASE UPLOADS
+# ========================================
+# ref.push() is one HTTPS round trip per record. BatchUploader instead
+# collects records in memory and writes them with a single multi-path
+# update() on the database root every flush_ms or max_records, whichever
+# comes first:
+#   root.update({"ultrasonicDB/<push id>": {...}, "objectDetectionDB/<push id>": {...}})
+# Push ids are generated locally with the same scheme Firebase uses
+# (timestamp prefix + random suffix), so keys still sort chronologically and
+# existing readers of the data see no difference.
+#
+# add() only appends to the outbox, so it never waits on the network, and
+# it never raises into the caller (a sensing thread): a record the outbox
+# cannot store (disk full, I/O error, locked database) is counted in
+# `dropped`. If an upload fails the records stay in the outbox and the worker retries with
+# exponential backoff. Pass a durable Outbox to survive restarts and long
+# offline periods; the default MemoryOutbox is bounded by record count.
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+class PushIdGenerator:
+    """Chronologically ordered 20-char keys, compatible with ref.push() keys."""
+
+    def __init__(self):
+        self._last_ms = -1
+        self._last_rand = [0] * 12
+        self._rng = random.SystemRandom()
+        self._lock = threading.Lock()
+
+    def __call__(self, now_ms=None):
+        now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+        with self._lock:
+            if now_ms == self._last_ms:
+                # Same millisecond: increment the random part so keys stay ordered
+                i = 11
+                while i >= 0 and self._last_rand[i] == 63:
+                    self._last_rand[i] = 0
+                    i -= 1
+                if i >= 0:
+                    self._last_rand[i] += 1
+            else:
+                self._last_ms = now_ms
+                self._last_rand = [self._rng.randrange(64) for _ in range(12)]
+            rand = list(self._last_rand)
+
+        stamp = []
+        for _ in range(8):
+            stamp.append(PUSH_CHARS[now_ms % 64])
+            now_ms //= 64
+        return "".join(reversed(stamp)) + "".join(PUSH_CHARS[r] for r in rand)
+
+
+push_id = PushIdGenerator()
+
+
+class BatchUploader:
+    def __init__(self, root, flush_ms=500, max_records=50, outbox=None, max_backoff_s=60.0,
+                 name="firebase-batch"):
+        self.root = root                    # db.reference("/") or any object with update(dict)
+        self.flush_s = flush_ms / 1000.0
+        self.max_records = max_records
+        self.outbox = outbox if outbox is not None else MemoryOutbox()
+        self.max_backoff_s = max_backoff_s
+        self.batches = 0
+        self.records = 0
+        self.store_errors = 0               # records add() could not write to the outbox
+        self._backoff = 0.0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._added = 0                     # records added since the worker last looked
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    @property
+    def dropped(self):
+        return self.outbox.dropped + self.store_errors
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def add(self, path, data):
+        """Queue one record under `path` (e.g. "ultrasonicDB"); returns its key."""
+        key = f"{path}/{push_id()}"
+        try:
+            self.outbox.append(key, data)
+        except (sqlite3.Error, OSError) as e:
+            self.store_errors += 1
+            if self.store_errors == 1 or self.store_errors % 100 == 0:
+                print(f"Outbox write failed ({self.store_errors} records dropped): {e}")
+            return key
+        with self._cond:
+            self._added += 1
+            self._cond.notify()
+        return key
+
+    def stop(self, timeout=3.0):
+        """Flush what is pending (best effort; the rest stays in the outbox) and stop."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _wait(self, seconds, until_full=False):
+        # Caller holds self._cond; returns early on stop (or a full batch)
+        deadline = time.monotonic() + seconds
+        while not self._stop and not (until_full and self._added >= self.max_records):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+    def _next_backoff(self):
+        return min(max(self._backoff * 2, self.flush_s, 1.0), self.max_backoff_s)
+
+    def _run(self):
+        backlog = True                      # first pass checks for records left by a previous run
+        while True:
+            with self._cond:
+                if self._backoff:
+                    # Upload failed: wait before retrying, whatever gets added meanwhile
+                    self._wait(self._backoff)
+                elif not backlog:
+                    while not self._added and not self._stop:
+                        self._cond.wait()
+                    # First record is in: give the batch flush_s to fill up
+                    self._wait(self.flush_s, until_full=True)
+                self._added = 0
+                stopping = self._stop
+
+            try:
+                batch = self.outbox.peek(self.max_records)
+            except (sqlite3.Error, OSError) as e:
+                # Retried like a failed upload instead of ending the worker
+                self._backoff = self._next_backoff()
+                print(f"Outbox read error (retry in {self._backoff:.0f} s): {e}")
+                if stopping:
+                    return
+                continue
+            backlog = len(batch) == self.max_records
+            if not batch:
+                if stopping:
+                    return
+                continue
+            try:
+                self.root.update({key: data for _, key, data in batch})
+            except Exception as e:
+                # Exponential backoff; the records stay in the outbox
+                self._backoff = self._next_backoff()
+                print(f"Firebase batch upload error ({len(batch)}+ pending, "
+                      f"retry in {self._backoff:.0f} s): {e}")
+                if stopping:
+                    return
+                continue
+            try:
+                self.outbox.ack([row_id for row_id, _, _ in batch])
+            except (sqlite3.Error, OSError) as e:
+                # Uploaded but not deleted: re-sent later under the same keys, which is harmless
+                print(f"Outbox ack error: {e}")
+            self._backoff = 0.0
+            self.batches += 1
+            self.records += len(batch)
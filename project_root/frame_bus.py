@@ -0,0 +1,127 @@
+import threading
+
+import numpy as np
+
+# ========================================
+# ZERO-COPY FRAME BUS
+# ========================================
+# Ring of preallocated numpy buffers with sequence numbers. The camera
+# copies each capture into a free slot once; consumers (detector, preview)
+# take read-only references to the newest slot instead of copying it.
+# A slot is only reused when no consumer holds a reference to it, so with
+# `slots` >= consumers + 2 the writer always finds a free slot.
+# Consumers block in wait() on a condition variable until a frame newer
+# than the last one they handled is published, instead of polling.
+
+
+class FrameRef:
+    """Read reference to one published frame; release() (or `with`) when done."""
+
+    def __init__(self, bus, index, seq, array, timestamp):
+        self._bus = bus
+        self._index = index
+        self.seq = seq
+        self.array = array
+        self.timestamp = timestamp
+
+    def release(self):
+        if self._bus is not None:
+            self._bus._release(self._index)
+            self._bus = None
+            self.array = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FrameBus:
+    def __init__(self, slots=4):
+        if slots < 2:
+            raise ValueError("FrameBus needs at least 2 slots")
+        self.slots = slots
+        self._buffers = None        # allocated on the first publish (shape unknown until then)
+        self._views = None
+        self._refs = [0] * slots
+        self._seqs = [0] * slots
+        self._stamps = [0.0] * slots
+        self._latest = None         # slot index of the newest frame
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._closed = False
+        self.dropped = 0
+
+    @property
+    def seq(self):
+        """Sequence number of the newest published frame (0 = none yet)."""
+        return self._seq
+
+    def _allocate(self, frame):
+        self._buffers = [np.empty_like(frame) for _ in range(self.slots)]
+        self._views = []
+        for buf in self._buffers:
+            view = buf.view()
+            view.flags.writeable = False
+            self._views.append(view)
+
+    def publish(self, frame, timestamp=0.0):
+        """Copy a frame into a free slot and make it the newest. Returns its seq, or None if dropped."""
+        with self._lock:
+            if self._buffers is None or self._buffers[0].shape != frame.shape:
+                if any(self._refs):
+                    self.dropped += 1
+                    return None
+                self._allocate(frame)
+            index = next((i for i in range(self.slots) if self._refs[i] == 0 and i != self._latest), None)
+            if index is None:
+                self.dropped += 1
+                return None
+            # Claim the slot so no reader picks it up half-written
+            self._refs[index] = 1
+
+        np.copyto(self._buffers[index], frame)
+
+        with self._lock:
+            self._refs[index] = 0
+            self._seq += 1
+            self._seqs[index] = self._seq
+            self._stamps[index] = timestamp
+            self._latest = index
+            self._new_frame.notify_all()
+            return self._seq
+
+    def acquire(self, after_seq=0):
+        """Reference to the newest frame if its seq > after_seq, else None."""
+        with self._lock:
+            return self._acquire_locked(after_seq)
+
+    def wait(self, after_seq=0, timeout=None):
+        """
+        Block until a frame with seq > after_seq is published and return a
+        reference to the newest one; None on timeout or after close().
+        """
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._closed or self._seq > after_seq, timeout)
+            if self._closed:
+                return None
+            return self._acquire_locked(after_seq)
+
+    def close(self):
+        """Wake all waiting consumers (used on shutdown)."""
+        with self._new_frame:
+            self._closed = True
+            self._new_frame.notify_all()
+
+    def _acquire_locked(self, after_seq):
+        index = self._latest
+        if index is None or self._seqs[index] <= after_seq:
+            return None
+        self._refs[index] += 1
+        return FrameRef(self, index, self._seqs[index], self._views[index], self._stamps[index])
+
+    def _release(self, index):
+        with self._lock:
+            self._refs[index] -= 1
@@ -0,0 +1,106 @@
+import threading
+
+import numpy as np
+
+# ========================================
+# ULTRASONIC + CAMERA FUSION
+# ========================================
+# The ultrasonic sensor knows how far the obstacle ahead is but not what it
+# is; the camera knows what is in view but not how far. HazardFusion pairs
+# each range reading with the closest (largest) confirmed track whose centre
+# lies in the middle strip of the frame, the part the sensor points at, and
+# speaks one alert: "Warning, chair, 80 centimetres".
+#
+# All speech goes through here, so range alerts and "<class> detected"
+# announcements share one prioritised stream: a class already named in the
+# range alert is not announced again, and object announcements are held
+# back (still due) while the "Stop" band is active.
+
+BANDS = (           # (upper bound cm, message, TTS priority)
+    (50, "Stop", 1),
+    (100, "Warning", 2),
+    (200, "Caution", 3),
+)
+CLEAR = ("Clear", 5)
+
+
+def distance_band(distance):
+    """(message, priority) for a distance in cm."""
+    for limit, message, priority in BANDS:
+        if distance < limit:
+            return message, priority
+    return CLEAR
+
+
+class HazardFusion:
+    def __init__(self, tracker, labels, speak, frame_width, central_fraction=0.4,
+                 repeat_s=3.0, min_hits=2, round_cm=10):
+        self.tracker = tracker
+        self.labels = labels                # TRACK_DTYPE array -> class names
+        self.speak = speak                  # speak(text, priority, key)
+        self.frame_width = frame_width
+        self.central_fraction = central_fraction
+        self.repeat_s = repeat_s            # re-announce an unchanged hazard after this
+        self.min_hits = min_hits            # ignore tracks not yet confirmed
+        self.round_cm = round_cm            # spoken distance step (keeps the phrase vocabulary small)
+        self._lock = threading.Lock()
+        self._message = CLEAR[0]
+        self._key = None                    # (message, object) last spoken
+        self._last_spoken = 0.0
+
+    def central_object(self, now):
+        """Class name of the largest confirmed track in the central strip, or None."""
+        tracks = self.tracker.boxes_at(now)
+        tracks = tracks[tracks["hits"] >= self.min_hits]
+        if len(tracks) == 0:
+            return None
+        boxes = tracks["bbox"].astype(np.int32)
+        centre_x = (boxes[:, 0] + boxes[:, 2]) / 2
+        half = self.central_fraction * self.frame_width / 2
+        central = np.abs(centre_x - self.frame_width / 2) <= half
+        if not central.any():
+            return None
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        best = np.flatnonzero(central)[np.argmax(area[central])]
+        return self.labels(tracks[best:best + 1])[0]
+
+    def on_range(self, distance, now):
+        """Feed one ultrasonic reading; speaks if the hazard changed or is due. Returns (message, priority)."""
+        message, priority = distance_band(distance)
+        with self._lock:
+            self._message = message
+            if message == CLEAR[0]:
+                self._key = None
+                return message, priority
+
+            name = self.central_object(now)
+            key = (message, name)
+            if key == self._key and now - self._last_spoken < self.repeat_s:
+                return message, priority
+            self._key = key
+            self._last_spoken = now
+
+        # key="range": a newer band supersedes a queued or playing one
+        if name is None:
+            self.speak(message, priority, "range")
+        else:
+            spoken_cm = int(round(distance / self.round_cm) * self.round_cm)
+            self.speak(f"{message}, {name}, {spoken_cm} centimetres", priority, "range")
+        return message, priority
+
+    def announce(self, policy, tracks, labels, now):
+        """
+        Object announcements (AnnouncementPolicy.select) merged into the same
+        stream. The policy is only consulted outside the "Stop" band, so tracks
+        held back there are not marked announced and are spoken afterwards.
+        """
+        with self._lock:
+            if self._message == BANDS[0][1]:
+                return []
+            names = policy.select(tracks, labels, now)
+            in_range_alert = self._key[1] if self._key is not None else None
+        names = [name for name in names if name != in_range_alert]
+        if names:
+            # No key: each announcement is news, a later one must not replace it
+            self.speak(", ".join(names) + " detected", CLEAR[1], None)
+        return names
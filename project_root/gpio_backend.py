@@ -0,0 +1,261 @@
+import os
+import random
+import threading
+import time
+
+# ========================================
+# GPIO BACKENDS
+# ========================================
+# All backends use physical BOARD pin numbers (same as GPIO.setmode(GPIO.BOARD)
+# in the rest of the project). Edge callbacks are called as
+# callback(pin, level, t_ns) where t_ns is a nanosecond timestamp; only the
+# difference between two edges of the same backend is meaningful.
+#
+# Backends are imported lazily, so importing this module never touches GPIO.
+# get_backend() picks one by name or from the SIDP_GPIO_BACKEND env var.
+
+# 40-pin header: physical pin -> BCM GPIO number (for lgpio)
+BOARD_TO_BCM = {
+    3: 2, 5: 3, 7: 4, 8: 14, 10: 15, 11: 17, 12: 18, 13: 27, 15: 22, 16: 23,
+    18: 24, 19: 10, 21: 9, 22: 25, 23: 11, 24: 8, 26: 7, 27: 0, 28: 1, 29: 5,
+    31: 6, 32: 12, 33: 13, 35: 19, 36: 16, 37: 26, 38: 20, 40: 21,
+}
+
+
+class GPIOBackend:
+    """Minimal interface the ranging code needs from a GPIO driver."""
+
+    def setup_output(self, pin, initial=False):
+        raise NotImplementedError
+
+    def setup_input(self, pin):
+        raise NotImplementedError
+
+    def output(self, pin, value):
+        raise NotImplementedError
+
+    def input(self, pin):
+        raise NotImplementedError
+
+    def add_edge_callback(self, pin, callback):
+        raise NotImplementedError
+
+    def remove_edge_callback(self, pin):
+        raise NotImplementedError
+
+    def pulse(self, pin, width_s=0.00001):
+        """Drive a short high pulse (HC-SR04 trigger)."""
+        self.output(pin, True)
+        time.sleep(width_s)
+        self.output(pin, False)
+
+    def cleanup(self):
+        pass
+
+
+class RPiGPIOBackend(GPIOBackend):
+    """RPi.GPIO driver using interrupt edge detection instead of polling."""
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        GPIO.setmode(GPIO.BOARD)
+
+    def setup_output(self, pin, initial=False):
+        self.GPIO.setup(pin, self.GPIO.OUT, initial=self.GPIO.HIGH if initial else self.GPIO.LOW)
+
+    def setup_input(self, pin):
+        self.GPIO.setup(pin, self.GPIO.IN)
+
+    def output(self, pin, value):
+        self.GPIO.output(pin, value)
+
+    def input(self, pin):
+        return self.GPIO.input(pin)
+
+    def add_edge_callback(self, pin, callback):
+        GPIO = self.GPIO
+
+        def _handler(channel):
+            # Timestamp first. The level is read after the fact and can be stale
+            # for short pulses; EdgeTimedSensor orders edges itself
+            t_ns = time.perf_counter_ns()
+            callback(channel, GPIO.input(channel), t_ns)
+
+        GPIO.add_event_detect(pin, GPIO.BOTH, callback=_handler)
+
+    def remove_edge_callback(self, pin):
+        self.GPIO.remove_event_detect(pin)
+
+    def cleanup(self):
+        self.GPIO.cleanup()
+
+
+class LGPIOBackend(GPIOBackend):
+    """
+    lgpio driver (works on Pi 5 / newer kernels where RPi.GPIO does not).
+    Edge timestamps are the kernel event ticks, which are more precise than
+    taking perf_counter_ns() inside a Python callback.
+    """
+
+    def __init__(self, chip=0):
+        import lgpio
+        self.lgpio = lgpio
+        self.handle = lgpio.gpiochip_open(chip)
+        self._callbacks = {}
+
+    def setup_output(self, pin, initial=False):
+        self.lgpio.gpio_claim_output(self.handle, BOARD_TO_BCM[pin], 1 if initial else 0)
+
+    def setup_input(self, pin):
+        self.lgpio.gpio_claim_input(self.handle, BOARD_TO_BCM[pin])
+
+    def output(self, pin, value):
+        self.lgpio.gpio_write(self.handle, BOARD_TO_BCM[pin], 1 if value else 0)
+
+    def input(self, pin):
+        return self.lgpio.gpio_read(self.handle, BOARD_TO_BCM[pin])
+
+    def add_edge_callback(self, pin, callback):
+        lgpio = self.lgpio
+        gpio = BOARD_TO_BCM[pin]
+        # Re-claim the line for edge alerts
+        lgpio.gpio_free(self.handle, gpio)
+        lgpio.gpio_claim_alert(self.handle, gpio, lgpio.BOTH_EDGES)
+
+        def _handler(chip, gpio, level, tick):
+            if level in (0, 1):  # 2 = watchdog timeout, not an edge
+                callback(pin, level, tick)
+
+        self._callbacks[pin] = lgpio.callback(self.handle, gpio, lgpio.BOTH_EDGES, _handler)
+
+    def remove_edge_callback(self, pin):
+        cb = self._callbacks.pop(pin, None)
+        if cb is not None:
+            cb.cancel()
+
+    def cleanup(self):
+        for pin in list(self._callbacks):
+            self.remove_edge_callback(pin)
+        self.lgpio.gpiochip_close(self.handle)
+
+
+class SimulatedGPIOBackend(GPIOBackend):
+    """
+    Deterministic software pin driver for tests and benchmarks. An echo pin
+    is attached to a trigger pin with attach_echo(); every trigger pulse then
+    produces a rising and a falling edge on the echo pin, with the pulse
+    width taken from `distances` (cm, or None to simulate a lost echo).
+
+    latency_s delays the rising edge after the trigger, noise_cm adds
+    gaussian jitter and dropout is the probability of losing an echo; all
+    randomness comes from a seeded generator, so runs are reproducible.
+    By default edges are delivered immediately with synthetic timestamps;
+    realtime=True delivers them from a timer thread at the simulated time,
+    which exercises timeouts and the real cost of waiting.
+    """
+
+    def __init__(self, seed=0, realtime=False):
+        self.levels = {}
+        self.callbacks = {}
+        self.echoes = {}
+        self.rng = random.Random(seed)
+        self.realtime = realtime
+        self.lock = threading.Lock()
+
+    def attach_echo(self, trig, echo, distances, cm_per_s=17150, latency_s=0.0, noise_cm=0.0, dropout=0.0):
+        self.echoes[trig] = {
+            "echo": echo,
+            "distances": iter(distances),
+            "cm_per_s": cm_per_s,
+            "latency_s": latency_s,
+            "noise_cm": noise_cm,
+            "dropout": dropout,
+        }
+
+    def setup_output(self, pin, initial=False):
+        self.levels[pin] = bool(initial)
+
+    def setup_input(self, pin):
+        self.levels.setdefault(pin, False)
+
+    def output(self, pin, value):
+        with self.lock:
+            previous = self.levels.get(pin, False)
+            self.levels[pin] = bool(value)
+        # Trigger fires on the falling edge, like the real sensor
+        if previous and not value and pin in self.echoes:
+            self._emit_echo(pin)
+
+    def input(self, pin):
+        return int(self.levels.get(pin, False))
+
+    def add_edge_callback(self, pin, callback):
+        self.callbacks[pin] = callback
+
+    def remove_edge_callback(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def pulse(self, pin, width_s=0.00001):
+        # No need to actually sleep for 10 us in simulation
+        self.output(pin, True)
+        self.output(pin, False)
+
+    def _emit_echo(self, trig):
+        cfg = self.echoes[trig]
+        distance = next(cfg["distances"], None)
+        if distance is None:
+            return
+        with self.lock:
+            if cfg["dropout"] and self.rng.random() < cfg["dropout"]:
+                return
+            if cfg["noise_cm"]:
+                distance = max(0.0, distance + self.rng.gauss(0.0, cfg["noise_cm"]))
+        width_s = distance / cfg["cm_per_s"]
+
+        if self.realtime:
+            echo = cfg["echo"]
+            timer = threading.Timer(cfg["latency_s"], self._edge, (echo, 1))
+            timer.daemon = True
+            timer.start()
+            timer = threading.Timer(cfg["latency_s"] + width_s, self._edge, (echo, 0))
+            timer.daemon = True
+            timer.start()
+            return
+
+        rise_ns = time.perf_counter_ns() + int(cfg["latency_s"] * 1e9)
+        self._edge(cfg["echo"], 1, rise_ns)
+        self._edge(cfg["echo"], 0, rise_ns + int(width_s * 1e9))
+
+    def _edge(self, pin, level, t_ns=None):
+        self.levels[pin] = bool(level)
+        callback = self.callbacks.get(pin)
+        if callback is not None:
+            callback(pin, level, t_ns if t_ns is not None else time.perf_counter_ns())
+
+    def cleanup(self):
+        self.callbacks.clear()
+        self.echoes.clear()
+
+
+def get_backend(name=None):
+    """
+    Create a GPIO backend: "rpi", "lgpio" or "sim". Defaults to the
+    SIDP_GPIO_BACKEND env var, else tries RPi.GPIO and then lgpio.
+    """
+    name = (name or os.environ.get("SIDP_GPIO_BACKEND", "auto")).lower()
+    if name == "rpi":
+        return RPiGPIOBackend()
+    if name == "lgpio":
+        return LGPIOBackend()
+    if name == "sim":
+        return SimulatedGPIOBackend()
+    if name != "auto":
+        raise ValueError(f"Unknown GPIO backend: {name}")
+
+    for backend_cls in (RPiGPIOBackend, LGPIOBackend):
+        try:
+            return backend_cls()
+        except (ImportError, RuntimeError) as e:
+            print(f"{backend_cls.__name__} unavailable: {e}")
+    raise RuntimeError("No GPIO backend available (set SIDP_GPIO_BACKEND=sim to simulate)")
@@ -0,0 +1,156 @@
+import os
+import statistics
+import time
+
+import numpy as np
+
+from model_cache import ModelCache
+
+# ========================================
+# YOLO INFERENCE BACKEND SELECTION
+# ========================================
+# PyTorch eager inference is the slowest option on a Pi CPU. load_detector()
+# exports the weights once to CPU-friendly formats (NCNN, OpenVINO, ONNX
+# Runtime), times each available one on a dummy frame, keeps the fastest and
+# warms it up, so the first camera frame does not pay for lazy init.
+#
+# Exports and the benchmark winner are kept in a ModelCache keyed by the
+# weights hash, so restarts skip both. Official weights that are not on disk
+# yet are downloaded first so they can be hashed. Backends whose runtime is not
+# installed are skipped. SIDP_YOLO_BACKEND forces one.
+
+# Export options per format (fp16 where the runtime supports it on CPU)
+EXPORT_OPTIONS = {
+    "ncnn": {"half": True},
+    "openvino": {"half": True},
+    "onnx": {"simplify": True},
+}
+DEFAULT_CANDIDATES = ("ncnn", "openvino", "onnx", "pytorch")
+
+
+def _export_path(weights, fmt):
+    # Where ultralytics writes each export (next to the .pt file)
+    stem, _ = os.path.splitext(weights)
+    if fmt == "onnx":
+        return stem + ".onnx"
+    return f"{stem}_{fmt}_model"
+
+
+def export_model(weights, fmt, imgsz=320, cache=None, **options):
+    """Export weights to fmt (once) and return the artifact path."""
+    from ultralytics import YOLO
+
+    if fmt == "pytorch":
+        return weights
+    if cache is not None:
+        path = cache.find_artifact(fmt, imgsz)
+        if path is not None:
+            return path
+    else:
+        path = _export_path(weights, fmt)
+        if os.path.exists(path):
+            return path
+
+    print(f"Exporting {weights} to {fmt} (one-off)...")
+    opts = dict(EXPORT_OPTIONS.get(fmt, {}))
+    opts.update(options)
+    path = YOLO(weights).export(format=fmt, imgsz=imgsz, **opts)
+    if cache is not None:
+        path = cache.store_artifact(fmt, imgsz, path)
+    return path
+
+
+def resolve_weights(weights):
+    """Local path of the weights; official names (e.g. yolov8n.pt) are downloaded like YOLO() does."""
+    if os.path.exists(weights):
+        return weights
+    from ultralytics.utils.downloads import attempt_download_asset
+    return str(attempt_download_asset(weights))
+
+
+def load_model(path):
+    from ultralytics import YOLO
+    return YOLO(path, task="detect")
+
+
+def benchmark(model, imgsz=320, runs=5, **predict_kwargs):
+    """Median single-frame latency (ms) on a blank frame; the first call is a warm-up."""
+    frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    model.predict(frame, imgsz=imgsz, verbose=False, **predict_kwargs)
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        model.predict(frame, imgsz=imgsz, verbose=False, **predict_kwargs)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def warm_up(model, imgsz=320, runs=3, **predict_kwargs):
+    """Run a few dummy frames so lazy init / graph optimisation happens now. Returns ms taken."""
+    frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        model.predict(frame, imgsz=imgsz, verbose=False, **predict_kwargs)
+    return (time.perf_counter() - t0) * 1000
+
+
+def load_detector(weights, backend=None, imgsz=320, candidates=DEFAULT_CANDIDATES, runs=5,
+                  cache_dir=None, **predict_kwargs):
+    """
+    Return (model, backend_name) ready for model.predict(). backend=None uses
+    SIDP_YOLO_BACKEND or "auto": reuse the cached benchmark winner if there
+    is one, otherwise benchmark the candidates and cache the fastest.
+    predict_kwargs (e.g. classes=...) are used for warm-up and timing so the
+    numbers match the real per-frame call.
+    """
+    t_start = time.perf_counter()
+    try:
+        weights = resolve_weights(weights)
+        cache = ModelCache(weights, cache_dir)
+    except Exception as e:
+        # Weights cannot be hashed (missing and not downloadable): run uncached
+        print(f"Model cache disabled: {e}")
+        cache = None
+    forced = backend or os.environ.get("SIDP_YOLO_BACKEND", "auto")
+    if forced != "auto":
+        backend = forced
+    else:
+        backend = cache.selected(imgsz) if cache is not None else None
+    if backend is not None:
+        try:
+            model = load_model(export_model(weights, backend, imgsz=imgsz, cache=cache))
+            warmup_ms = warm_up(model, imgsz=imgsz, runs=1, **predict_kwargs)
+        except Exception as e:
+            if forced != "auto":
+                raise
+            # Cached winner is broken (e.g. runtime uninstalled): benchmark again
+            print(f"Cached YOLO backend {backend} failed: {e}")
+        else:
+            # Only a benchmark (or its cached result) may set the auto selection
+            if cache is not None:
+                cache.record(imgsz, backend if forced == "auto" else None, warmup_ms=warmup_ms)
+            print(f"YOLO backend: {backend} ready in {time.perf_counter() - t_start:.1f} s")
+            return model, backend
+
+    best = None
+    timings = {}
+    for fmt in candidates:
+        try:
+            model = load_model(export_model(weights, fmt, imgsz=imgsz, cache=cache))
+            ms = benchmark(model, imgsz=imgsz, runs=runs, **predict_kwargs)
+        except Exception as e:
+            print(f"YOLO backend {fmt} unavailable: {e}")
+            continue
+        print(f"YOLO backend {fmt}: {ms:.1f} ms/frame")
+        timings[fmt] = round(ms, 1)
+        if best is None or ms < best[2]:
+            best = (model, fmt, ms)
+
+    if best is None:
+        raise RuntimeError(f"No usable YOLO backend among {', '.join(candidates)}")
+    model, fmt, ms = best
+    # The benchmark already ran the chosen model several times, so it is warm
+    if cache is not None:
+        cache.record(imgsz, fmt, benchmarks=timings)
+    print(f"YOLO backend selected: {fmt} ({ms:.1f} ms/frame), ready in {time.perf_counter() - t_start:.1f} s")
+    return model, fmt
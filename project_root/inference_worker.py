@@ -0,0 +1,106 @@
+import threading
+import time
+
+# ========================================
+# ASYNCHRONOUS INFERENCE WORKER
+# ========================================
+# The capture/display loop hands every frame to a LatestFrameSlot and never
+# waits for the model. A dedicated thread always takes the newest frame
+# (older, unprocessed frames are simply overwritten), so the preview frame
+# rate stays steady and detections are never older than one inference.
+
+
+class LatestFrameSlot:
+    """Single-slot, latest-wins frame handoff between two threads."""
+
+    def __init__(self, now=time.time):
+        self.now = now                      # timestamp source for captured_at
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._captured_at = 0.0
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, frame):
+        """Publish a frame, replacing any frame the consumer has not taken yet."""
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._frame_id += 1
+            self._captured_at = self.now()
+            self._cond.notify()
+            return self._frame_id
+
+    def take(self, timeout=None):
+        """
+        Wait for a new frame; returns (frame_id, frame, captured_at), or
+        (None, None, None) on timeout or close.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frame is not None or self._closed, timeout):
+                return None, None, None
+            if self._frame is None:
+                return None, None, None
+            frame, self._frame = self._frame, None
+            return self._frame_id, frame, self._captured_at
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class InferenceWorker:
+    """
+    Runs predict(frame) on the newest frame in a background thread and calls
+    on_result(frame_id, frame, result, captured_at) with each result.
+    `latency` holds the last inference time and `age` how old the frame was
+    when its result became available (both in seconds). `now` stamps the
+    frames; pass the clock the result handler compares them against.
+    """
+
+    def __init__(self, predict, on_result, name="InferenceWorker", now=time.time):
+        self.predict = predict
+        self.on_result = on_result
+        self.now = now
+        self.slot = LatestFrameSlot(now)
+        self.latency = 0.0
+        self.age = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, frame):
+        """Non-blocking: hand a frame to the worker (drops the previous one if still queued)."""
+        return self.slot.put(frame)
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self.slot.close()
+        self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame_id, frame, captured_at = self.slot.take(timeout=0.5)
+            if frame is None:
+                continue
+
+            t0 = self.now()
+            try:
+                result = self.predict(frame)
+            except Exception as e:
+                print(f"Inference error: {e}")
+                time.sleep(0.1)
+                continue
+            done = self.now()
+            self.latency = done - t0
+            self.age = done - captured_at
+
+            try:
+                self.on_result(frame_id, frame, result, captured_at)
+            except Exception as e:
+                print(f"Detection handling error: {e}")
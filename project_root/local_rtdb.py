@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+
+from firebase_batch import push_id
+
+# ========================================
+# LOCAL REALTIME DATABASE STAND-IN
+# ========================================
+# Implements the part of firebase_admin.db.Reference the uploaders use
+# (get, set, update with multi-path keys, push, child) on an in-process dict,
+# optionally mirrored to a JSON file. Set `offline = True` to make writes
+# raise like a dropped connection, and `latency_s` to simulate the round
+# trip, so the batching/outbox path can be exercised without a network or
+# credentials. SIDP_FIREBASE=local selects it in the camera scripts.
+
+
+def _parts(path):
+    return [p for p in path.strip("/").split("/") if p]
+
+
+class LocalRealtimeDB:
+    def __init__(self, path=None, latency_s=0.0):
+        self.path = path                    # JSON mirror file, or None for memory only
+        self.latency_s = latency_s
+        self.offline = False
+        self.writes = 0                     # round trips that reached the "server"
+        self._data = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._data = json.load(f)
+
+    def reference(self, path="/"):
+        return LocalReference(self, _parts(path))
+
+    def _round_trip(self):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self.offline:
+            raise ConnectionError("local RTDB is offline")
+
+    def _get(self, parts):
+        with self._lock:
+            node = self._data
+            for p in parts:
+                if not isinstance(node, dict) or p not in node:
+                    return None
+                node = node[p]
+            return json.loads(json.dumps(node))
+
+    def _write(self, changes):
+        """changes: list of (parts, value); value None deletes, like Firebase."""
+        self._round_trip()
+        with self._lock:
+            for parts, value in changes:
+                if not parts:
+                    self._data = value if isinstance(value, dict) else {}
+                    continue
+                node = self._data
+                for p in parts[:-1]:
+                    if not isinstance(node.get(p), dict):
+                        node[p] = {}
+                    node = node[p]
+                if value is None:
+                    node.pop(parts[-1], None)
+                else:
+                    node[parts[-1]] = json.loads(json.dumps(value))
+            self.writes += 1
+            if self.path:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(self._data, f)
+                os.replace(tmp, self.path)
+
+
+class LocalReference:
+    def __init__(self, db, parts):
+        self._db = db
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    def child(self, path):
+        return LocalReference(self._db, self._parts + _parts(path))
+
+    def get(self):
+        return self._db._get(self._parts)
+
+    def set(self, value):
+        self._db._write([(self._parts, value)])
+
+    def update(self, value):
+        if not isinstance(value, dict) or not value:
+            raise ValueError("update() needs a non-empty dict")
+        self._db._write([(self._parts + _parts(k), v) for k, v in value.items()])
+
+    def push(self, value=""):
+        ref = self.child(push_id())
+        ref.set(value)
+        return ref
@@ -0,0 +1,59 @@
+import bisect
+from collections import deque
+
+# ========================================
+# STREAMING ROLLING MEDIAN
+# ========================================
+# Sliding-window median that updates with every single ping instead of
+# collecting a fresh batch of samples per reading. The valid values in the
+# window are kept in a sorted list (bisect insert / delete), so memory is
+# bounded by the window and each update costs O(k) element moves, which for
+# the small windows used here (k = 5) is cheaper than heaps with lazy
+# deletion.
+# A None update records a dropped ping (timeout): it takes a slot in the
+# window but not in the median, so `valid` tells how trustworthy it is.
+
+
+class RollingMedian:
+    """Median of the last `window` values, updated one value at a time."""
+
+    def __init__(self, window=5):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = window
+        self._values = deque()
+        self._sorted = []       # valid values in the window, ascending
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def valid(self):
+        """Number of non-None values currently in the window."""
+        return len(self._sorted)
+
+    def update(self, value):
+        """Add one value (None = dropped), slide the window, return the median."""
+        self._values.append(value)
+        if value is not None:
+            bisect.insort(self._sorted, value)
+
+        if len(self._values) > self.window:
+            oldest = self._values.popleft()
+            if oldest is not None:
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+
+        return self.median()
+
+    def median(self):
+        """Median of the valid values in the window, or None if there are none."""
+        n = len(self._sorted)
+        if not n:
+            return None
+        if n % 2:
+            return self._sorted[n // 2]
+        return (self._sorted[n // 2 - 1] + self._sorted[n // 2]) / 2
+
+    def clear(self):
+        self._values.clear()
+        self._sorted.clear()
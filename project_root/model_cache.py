@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# ========================================
+# PERSISTENT MODEL ARTIFACT CACHE
+# ========================================
+# Exported detector artifacts live under
+#   <cache_dir>/<weights sha256[:16]>/<format>_<imgsz>/
+# next to a meta.json recording which backend won the benchmark, the
+# per-backend timings and how long warm-up took. After a restart (e.g. a
+# crash on the device) load_detector() goes straight to the cached winner:
+# no export, no benchmark, one warm-up frame.
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SIDP_MODEL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "sidp_models")
+)
+
+
+def weights_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+class ModelCache:
+    def __init__(self, weights, cache_dir=None):
+        self.weights = weights
+        self.key = weights_hash(weights)
+        self.root = os.path.join(cache_dir or DEFAULT_CACHE_DIR, self.key)
+        self.meta_path = os.path.join(self.root, "meta.json")
+        os.makedirs(self.root, exist_ok=True)
+
+    def artifact_dir(self, fmt, imgsz):
+        return os.path.join(self.root, f"{fmt}_{imgsz}")
+
+    def find_artifact(self, fmt, imgsz):
+        """Path of a cached export (file or model dir), or None."""
+        folder = self.artifact_dir(fmt, imgsz)
+        if not os.path.isdir(folder):
+            return None
+        entries = os.listdir(folder)
+        return os.path.join(folder, entries[0]) if len(entries) == 1 else None
+
+    def store_artifact(self, fmt, imgsz, exported_path):
+        """Move a fresh export into the cache and return its new path."""
+        folder = self.artifact_dir(fmt, imgsz)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+        target = os.path.join(folder, os.path.basename(os.path.normpath(exported_path)))
+        shutil.move(exported_path, target)
+        return target
+
+    def load_meta(self):
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, imgsz, selected, benchmarks=None, warmup_ms=None):
+        """Remember the selected backend (and timings) for this input size."""
+        meta = self.load_meta()
+        meta["weights"] = os.path.abspath(self.weights)
+        entry = meta.setdefault("imgsz", {}).setdefault(str(imgsz), {})
+        if selected is not None:
+            entry["selected"] = selected
+        if benchmarks is not None:
+            entry["benchmarks_ms"] = benchmarks
+        if warmup_ms is not None:
+            entry["warmup_ms"] = round(warmup_ms, 1)
+        entry["updated"] = int(time.time())
+
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self.meta_path)
+
+    def selected(self, imgsz):
+        return self.load_meta().get("imgsz", {}).get(str(imgsz), {}).get("selected")
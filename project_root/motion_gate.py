@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+# ========================================
+# MOTION-GATED INFERENCE
+# ========================================
+# A cheap frame-difference check on a strided, single-channel thumbnail
+# decides whether YOLO needs to run at all:
+#   "skip" - nothing moved since the last inference, keep old detections
+#   "roi"  - motion is localized, run the model on that crop only
+#   "full" - large motion, no reference yet, or the periodic refresh is due
+# The reference thumbnail is the one from the last inference, so slow
+# motion accumulates until it crosses the threshold.
+
+SKIP, ROI, FULL = "skip", "roi", "full"
+
+
+class MotionGate:
+    def __init__(self, stride=8, threshold=25, min_fraction=0.002, max_roi_fraction=0.5,
+                 roi_pad=0.15, min_roi=96, full_refresh_s=2.0):
+        self.stride = stride                        # thumbnail = every Nth pixel
+        self.threshold = threshold                  # per-pixel intensity change
+        self.min_fraction = min_fraction            # changed pixels below this = static
+        self.max_roi_fraction = max_roi_fraction    # ROI bigger than this -> full frame
+        self.roi_pad = roi_pad                      # grow ROI by this fraction per side
+        self.min_roi = min_roi                      # smallest crop side worth running
+        self.full_refresh_s = full_refresh_s
+        self._reference = None
+        self._last_full = 0.0
+        self.counts = {SKIP: 0, ROI: 0, FULL: 0}
+
+    def _thumbnail(self, frame):
+        # Green channel approximates luma well enough for change detection
+        thumb = frame[::self.stride, ::self.stride]
+        if thumb.ndim == 3:
+            thumb = thumb[..., 1]
+        return thumb.astype(np.int16)
+
+    def decide(self, frame, now=None):
+        """Return (action, roi) where roi is (x1, y1, x2, y2) for "roi", else None."""
+        now = time.monotonic() if now is None else now
+        thumb = self._thumbnail(frame)
+        if (self._reference is None or self._reference.shape != thumb.shape
+                or now - self._last_full >= self.full_refresh_s):
+            return self._count(FULL, None)
+
+        changed = np.abs(thumb - self._reference) > self.threshold
+        if changed.mean() < self.min_fraction:
+            return self._count(SKIP, None)
+
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        h, w = frame.shape[:2]
+        y1, y2 = rows[0] * self.stride, (rows[-1] + 1) * self.stride
+        x1, x2 = cols[0] * self.stride, (cols[-1] + 1) * self.stride
+
+        pad_x = max(int((x2 - x1) * self.roi_pad), (self.min_roi - (x2 - x1)) // 2, 0)
+        pad_y = max(int((y2 - y1) * self.roi_pad), (self.min_roi - (y2 - y1)) // 2, 0)
+        x1, x2 = max(0, x1 - pad_x), min(w, x2 + pad_x)
+        y1, y2 = max(0, y1 - pad_y), min(h, y2 + pad_y)
+
+        if (x2 - x1) * (y2 - y1) > self.max_roi_fraction * w * h:
+            return self._count(FULL, None)
+        return self._count(ROI, (int(x1), int(y1), int(x2), int(y2)))
+
+    def mark_inferred(self, frame, full, now=None):
+        """Call after running the model so the next diff is against this frame."""
+        self._reference = self._thumbnail(frame)
+        if full:
+            self._last_full = time.monotonic() if now is None else now
+
+    def _count(self, action, roi):
+        self.counts[action] += 1
+        return action, roi
+
+
+def merge_roi_detections(previous, new, roi):
+    """Previous detections outside the ROI plus the fresh ones from inside it."""
+    x1, y1, x2, y2 = roi
+    boxes = previous["bbox"]
+    outside = (boxes[:, 2] <= x1) | (boxes[:, 0] >= x2) | (boxes[:, 3] <= y1) | (boxes[:, 1] >= y2)
+    return np.concatenate([previous[outside], new])
+
+
+class GatedDetector:
+    """
+    Wraps predict(image) + postprocess(result) with a MotionGate. Calling it
+    with a frame returns the detections (DETECTION_DTYPE array) or None when
+    the gate skipped inference and the previous detections still stand.
+
+    After an ROI pass the result includes boxes carried over from outside
+    the crop; `fresh` and `roi` hold what the model actually saw, for
+    Tracker.update(fresh, now, roi) so carried boxes do not count as hits.
+    """
+
+    def __init__(self, predict, postprocess, gate=None):
+        self.predict = predict
+        self.postprocess = postprocess
+        self.gate = gate if gate is not None else MotionGate()
+        self.detections = postprocess(None)
+        self.fresh = self.detections        # detections produced by the last inference
+        self.roi = None                     # crop of the last inference (None = full frame)
+
+    def __call__(self, frame):
+        action, roi = self.gate.decide(frame)
+        if action == SKIP:
+            return None
+
+        if action == ROI:
+            x1, y1, x2, y2 = roi
+            crop = np.ascontiguousarray(frame[y1:y2, x1:x2])
+            new = self.postprocess(self.predict(crop))
+            new["bbox"] += np.array([x1, y1, x1, y1], dtype=np.int16)
+            dets = merge_roi_detections(self.detections, new, roi)
+        else:
+            dets = new = self.postprocess(self.predict(frame))
+
+        self.gate.mark_inferred(frame, full=(action == FULL))
+        self.detections = dets
+        self.fresh, self.roi = new, roi
+        return dets
@@ -1,58 +1,33 @@
 def run_object_detection():
     import cv2
     import time
-    import threading
-    import queue
-    import subprocess
-    from ultralytics import YOLO
     from picamera2 import Picamera2
-    import numpy as np
-
-    # --------- Text-to-Speech setup ----------
-    tts_queue = queue.Queue()
-    use_pyttsx3 = False
-    engine = None
-
-    try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        engine.setProperty("rate", 150)
-        engine.setProperty("volume", 1.0)
-        use_pyttsx3 = True
-    except Exception:
-        use_pyttsx3 = False
-
-    def tts_worker():
-        while True:
-            text = tts_queue.get()
-            if text is None:
-                break
-            try:
-                if use_pyttsx3 and engine is not None:
-                    engine.say(text)
-                    engine.runAndWait()
-                else:
-                    subprocess.run(["espeak", text], check=False)
-            except Exception as e:
-                print("TTS error:", e)
-            tts_queue.task_done()
-
-    tts_thread = threading.Thread(target=tts_worker, daemon=True)
-    tts_thread.start()
-
-    def speak(text):
-        tts_queue.put(text)
+    from detection_post import DetectionPostprocessor
+    from inference_backend import load_detector
+    from tracker import Tracker
+    from announce_policy import AnnouncementPolicy
+    from speech import SpeechScheduler
+    from phrase_cache import alert_vocabulary, make_speaker
 
     # --------- YOLO + PiCamera2 ----------
-    model = YOLO("yolov8n.pt")
+    model, model_backend = load_detector("yolov8n.pt", imgsz=320)
 
     allowed_classes = {
         'person', 'car', 'cat', 'dog', 'stop sign',
         'toilet', 'chair', 'bed', 'tv', 'dining table', 'vase'
     }
 
-    ANNOUNCE_COOLDOWN = 5.0
-    last_announced = {}
+    postprocess = DetectionPostprocessor(model.names, allowed_classes)
+
+    # --------- Text-to-Speech setup ----------
+    # "<class> detected" phrases are pre-rendered to PCM (no espeak fork per announcement)
+    speech = SpeechScheduler(make_speaker(alert_vocabulary(allowed_classes)), max_age_s=2.0).start()
+
+    def speak(text):
+        speech.say(text, priority=5)
+
+    tracker = Tracker()
+    announce_policy = AnnouncementPolicy(confirm_hits=3)
 
     picam2 = Picamera2()
     config = picam2.create_preview_configuration(
@@ -68,65 +43,22 @@ def run_object_detection():
             frame = picam2.capture_array()
             frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
 
-            results = model.predict(frame, imgsz=320, conf=0.35, verbose=False)
+            results = model.predict(frame, imgsz=320, conf=0.35, classes=postprocess.class_ids, verbose=False)
             r = results[0]
 
-            # If no detections
-            if len(r.boxes) == 0:
-                cv2.imshow("YOLOv8", frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-                continue
-
-            # Extract and prepare detections
-            try:
-                cls_array = r.boxes.cls.cpu().numpy()
-                boxes = r.boxes.xyxy.cpu().numpy()
-                confs = r.boxes.conf.cpu().numpy()
-            except Exception:
-                cls_array = np.array(r.boxes.cls)
-                boxes = np.array(r.boxes.xyxy)
-                confs = np.array(r.boxes.conf)
-
-            cls_array = np.atleast_1d(np.squeeze(cls_array))
-            confs = np.atleast_1d(np.squeeze(confs))
-            boxes = np.atleast_2d(boxes)
-
-            n = min(len(boxes), len(cls_array), len(confs))
-            if n == 0:
-                cv2.imshow("YOLOv8", frame)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-                continue
-
-            boxes, cls_array, confs = boxes[:n], cls_array[:n], confs[:n]
-
-            detected_names = []
-            for c in cls_array:
-                idx = int(c)
-                name = model.names.get(idx, str(idx)) if isinstance(model.names, dict) else model.names[idx]
-                detected_names.append(name)
-
-            keep_idx = [i for i, name in enumerate(detected_names) if name in allowed_classes]
+            # Allowed detections as a structured array (cls, conf, bbox)
+            dets = postprocess(r)
+            labels = postprocess.labels(dets)
 
             now = time.time()
-            announced_this_frame = set()
-            for i in keep_idx:
-                name = detected_names[i]
-                if name in announced_this_frame:
-                    continue
-                announced_this_frame.add(name)
-
-                last_time = last_announced.get(name, 0)
-                if now - last_time >= ANNOUNCE_COOLDOWN:
-                    speak(f"{name} detected")
-                    last_announced[name] = now
-
-            for i in keep_idx:
-                x1, y1, x2, y2 = boxes[i].astype(int)
-                conf = float(confs[i])
-                name = detected_names[i]
-                label = f"{name} {conf:.2f}"
+            tracks = tracker.update(dets, now)
+            to_announce = announce_policy.select(tracks, postprocess.labels(tracks), now)
+            if to_announce:
+                speak(", ".join(to_announce) + " detected")
+
+            for det, name in zip(dets, labels):
+                x1, y1, x2, y2 = (int(v) for v in det["bbox"])
+                label = f"{name} {det['conf']:.2f}"
                 cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
                 cv2.putText(
                     frame, label, (x1, max(y1 - 8, 10)),
@@ -140,7 +72,6 @@ def run_object_detection():
     finally:
         picam2.stop()
         cv2.destroyAllWindows()
-        tts_queue.put(None)
-        tts_thread.join(timeout=1)
+        speech.stop(timeout=1)
         print("Exited cleanly.")
 
@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+
+# ========================================
+# DURABLE UPLOAD OUTBOX
+# ========================================
+# Records waiting for upload live in an append-only SQLite table in WAL mode,
+# so an offline stretch (no Wi-Fi / hotspot on the move) or a restart does
+# not lose telemetry. The uploader reads the oldest rows, sends them, and
+# deletes them only after the server accepted the write (at-least-once).
+#
+# The file is bounded by max_bytes: when it grows past the quota the oldest
+# records are dropped first. synchronous=NORMAL keeps an append at a few
+# tens of microseconds; a power cut may lose the last transaction, never
+# corrupt the database.
+#
+# MemoryOutbox has the same interface without persistence.
+
+DEFAULT_OUTBOX_PATH = os.environ.get(
+    "SIDP_OUTBOX", os.path.join(os.path.expanduser("~"), ".cache", "sidp_outbox.sqlite")
+)
+
+
+class Outbox:
+    def __init__(self, path=None, max_bytes=50 * 1024 * 1024, check_every=100):
+        self.path = path or DEFAULT_OUTBOX_PATH
+        self.max_bytes = max_bytes
+        self.check_every = check_every      # appends between quota checks
+        self.dropped = 0
+        self._appends = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " key TEXT NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+        self._page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+
+    def append(self, key, data):
+        payload = json.dumps(data, separators=(",", ":"))
+        with self._lock:
+            self._db.execute("INSERT INTO outbox (key, payload) VALUES (?, ?)", (key, payload))
+            self._appends += 1
+            if self._appends % self.check_every == 0:
+                self._enforce_quota()
+
+    def peek(self, limit):
+        """Oldest `limit` records as (id, key, data); they stay until ack()."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, key, payload FROM outbox ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, key, json.loads(payload)) for row_id, key, payload in rows]
+
+    def ack(self, ids):
+        """Delete records that were uploaded."""
+        if not ids:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE id BETWEEN ? AND ?", (min(ids), max(ids)))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def size_bytes(self):
+        pages = self._db.execute("PRAGMA page_count").fetchone()[0]
+        free = self._db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * self._page_size
+
+    def _enforce_quota(self):
+        # Drop the oldest 10% of rows until the live data fits again
+        while self.size_bytes() > self.max_bytes:
+            count = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            if count == 0:
+                break
+            n = max(count // 10, 1)
+            self._db.execute(
+                "DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)", (n,)
+            )
+            self.dropped += n
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class MemoryOutbox:
+    """In-memory outbox (lost on restart), bounded by record count."""
+
+    def __init__(self, max_records=5000):
+        self.max_records = max_records
+        self.dropped = 0
+        self._next_id = 0
+        self._rows = deque()
+        self._lock = threading.Lock()
+
+    def append(self, key, data):
+        with self._lock:
+            if len(self._rows) >= self.max_records:
+                self._rows.popleft()
+                self.dropped += 1
+            self._next_id += 1
+            self._rows.append((self._next_id, key, data))
+
+    def peek(self, limit):
+        with self._lock:
+            return [self._rows[i] for i in range(min(limit, len(self._rows)))]
+
+    def ack(self, ids):
+        if not ids:
+            return
+        last = max(ids)
+        with self._lock:
+            while self._rows and self._rows[0][0] <= last:
+                self._rows.popleft()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def close(self):
+        pass
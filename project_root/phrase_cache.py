@@ -0,0 +1,267 @@
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+from fusion import BANDS
+from speech import default_speaker
+
+# ========================================
+# PRE-RENDERED ALERT AUDIO
+# ========================================
+# Synthesising every alert from scratch (fork/exec espeak, or pyttsx3
+# runAndWait) costs hundreds of ms before the first sound. PhraseCache keeps
+# raw PCM for the fixed vocabulary (distance bands, class names, "<class>
+# detected", rounded distances) rendered once in the background at startup,
+# plus an LRU of other phrases rendered on first use.
+#
+# Alerts are built from comma-separated segments ("Warning, chair, 80
+# centimetres"), so each segment is cached separately and joined with a
+# short pause; the combinations never need rendering.
+#
+# Audio goes to one long-lived sink (sounddevice stream, or an aplay process
+# reading raw PCM on stdin). A sink's play() returns only once the audio has
+# been heard, so SpeechScheduler's idea of what is playing stays true. It
+# checks the cancel flag every 20 ms chunk and drops whatever is still
+# buffered when cancelled. aplay is paced by the sample rate (its pipe would
+# otherwise swallow seconds of audio at once) and is restarted to flush it.
+# CachedSpeaker plugs both into SpeechScheduler as a drop-in for
+# EspeakSpeaker.
+
+SAMPLE_WIDTH = 2            # espeak renders 16-bit mono
+SEGMENT_PAUSE_S = 0.08
+
+
+def parse_wav(data):
+    """(sample_rate, pcm bytes) from a WAV blob; tolerates espeak's streamed sizes."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a WAV stream")
+    rate = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk, size = data[pos:pos + 4], struct.unpack_from("<I", data, pos + 4)[0]
+        if chunk == b"fmt ":
+            rate = struct.unpack_from("<I", data, pos + 12)[0]
+        elif chunk == b"data":
+            # --stdout cannot seek back, so the size may be 0 or bogus: take the rest
+            end = pos + 8 + size
+            return rate, data[pos + 8:end] if 0 < size and end <= len(data) else data[pos + 8:]
+        pos += 8 + size + (size & 1)
+    raise ValueError("WAV stream has no data chunk")
+
+
+class EspeakRenderer:
+    def __init__(self, args=("espeak",)):
+        self.args = list(args)
+        self.sample_rate = None
+
+    def __call__(self, text):
+        data = subprocess.run(self.args + ["--stdout", text], capture_output=True, check=True).stdout
+        rate, pcm = parse_wav(data)
+        self.sample_rate = rate
+        return pcm
+
+
+class PhraseCache:
+    def __init__(self, renderer=None, max_dynamic=64):
+        self.renderer = renderer if renderer is not None else EspeakRenderer()
+        self.max_dynamic = max_dynamic
+        self.hits = 0
+        self.misses = 0
+        self._fixed = {}                    # pre-rendered vocabulary, never evicted
+        self._dynamic = OrderedDict()       # LRU of everything else
+        self._lock = threading.Lock()
+
+    @property
+    def sample_rate(self):
+        return getattr(self.renderer, "sample_rate", None) or 22050
+
+    def preload(self, phrases, background=True):
+        """Render the fixed vocabulary (in a background thread by default)."""
+        def work():
+            for phrase in phrases:
+                if phrase in self._fixed:
+                    continue
+                try:
+                    pcm = self.renderer(phrase)
+                except Exception as e:
+                    print(f"Phrase cache: could not render {phrase!r}: {e}")
+                    continue
+                with self._lock:
+                    self._fixed[phrase] = pcm
+                    self._dynamic.pop(phrase, None)
+
+        if not background:
+            work()
+            return None
+        thread = threading.Thread(target=work, name="phrase-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def segment(self, text):
+        with self._lock:
+            pcm = self._fixed.get(text)
+            if pcm is None:
+                pcm = self._dynamic.get(text)
+                if pcm is not None:
+                    self._dynamic.move_to_end(text)
+            if pcm is not None:
+                self.hits += 1
+                return pcm
+            self.misses += 1
+
+        pcm = self.renderer(text)
+        with self._lock:
+            self._dynamic[text] = pcm
+            while len(self._dynamic) > self.max_dynamic:
+                self._dynamic.popitem(last=False)
+        return pcm
+
+    def get(self, text):
+        """PCM for a phrase, joining its comma-separated segments with a short pause."""
+        parts = [p.strip() for p in text.split(",") if p.strip()]
+        pcms = [self.segment(p) for p in parts]
+        if len(pcms) == 1:
+            return pcms[0]
+        pause = bytes(int(self.sample_rate * SEGMENT_PAUSE_S) * SAMPLE_WIDTH)
+        return pause.join(pcms)
+
+
+def alert_vocabulary(classes=(), max_range_cm=200, step_cm=10):
+    """Every fixed segment the alert stream (HazardFusion) can produce."""
+    phrases = [message for _, message, _ in BANDS]
+    for name in sorted(classes):
+        phrases += [name, f"{name} detected"]
+    phrases += [f"{cm} centimetres" for cm in range(0, max_range_cm + step_cm, step_cm)]
+    return phrases
+
+
+class AplaySink:
+    """Persistent `aplay` reading raw 16-bit mono PCM from a pipe."""
+
+    def __init__(self, sample_rate=22050, chunk_s=0.02, lead_s=0.1):
+        self.sample_rate = sample_rate
+        self.chunk_s = chunk_s
+        self.chunk_bytes = int(sample_rate * chunk_s) * SAMPLE_WIDTH
+        self.lead_s = lead_s                # how far writes may run ahead of playback
+        self._proc = None
+
+    def _pipe(self):
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(self.sample_rate)],
+                stdin=subprocess.PIPE,
+            )
+        return self._proc.stdin
+
+    def play(self, pcm, cancelled):
+        """Write pcm at playback speed; returns when it has played or cancelled is set."""
+        pipe = self._pipe()
+        bytes_per_s = self.sample_rate * SAMPLE_WIDTH
+        t0 = time.monotonic()
+        for start in range(0, len(pcm), self.chunk_bytes):
+            ahead = start / bytes_per_s - (time.monotonic() - t0)
+            if cancelled.wait(max(0.0, ahead - self.lead_s)):
+                break
+            pipe.write(pcm[start:start + self.chunk_bytes])
+            pipe.flush()
+        else:
+            # Everything is written; wait out what aplay still has buffered
+            cancelled.wait(max(0.0, len(pcm) / bytes_per_s - (time.monotonic() - t0)))
+        if cancelled.is_set():
+            self._restart()
+
+    def _restart(self):
+        # Drop the audio still queued in the pipe and ALSA; _pipe() starts a fresh aplay
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    def close(self):
+        if self._proc is not None:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=2)
+            self._proc = None
+
+
+class SoundDeviceSink:
+    """Persistent PortAudio output stream (python-sounddevice)."""
+
+    def __init__(self, sample_rate=22050, chunk_s=0.02):
+        import sounddevice
+        self.sample_rate = sample_rate
+        self.chunk_bytes = int(sample_rate * chunk_s) * SAMPLE_WIDTH
+        self._stream = sounddevice.RawOutputStream(samplerate=sample_rate, channels=1, dtype="int16")
+        self._stream.start()
+
+    def play(self, pcm, cancelled):
+        """Blocking writes pace themselves; returns when pcm has played or cancelled is set."""
+        for start in range(0, len(pcm), self.chunk_bytes):
+            if cancelled.is_set():
+                break
+            self._stream.write(pcm[start:start + self.chunk_bytes])
+        else:
+            cancelled.wait(self._stream.latency)
+        if cancelled.is_set():
+            # abort() discards buffered audio instead of draining it
+            self._stream.abort()
+            self._stream.start()
+
+    def close(self):
+        self._stream.stop()
+        self._stream.close()
+
+
+def default_sink(sample_rate=22050):
+    try:
+        return SoundDeviceSink(sample_rate)
+    except Exception:
+        if shutil.which("aplay"):
+            return AplaySink(sample_rate)
+        raise RuntimeError("No audio sink: install python3-sounddevice or alsa-utils (aplay)")
+
+
+class CachedSpeaker:
+    """SpeechScheduler speaker that plays cached PCM through a persistent sink."""
+
+    def __init__(self, cache, sink=None):
+        self.cache = cache
+        self.sink = sink if sink is not None else default_sink(cache.sample_rate)
+        self._cancelled = threading.Event()
+
+    def play(self, text, cancelled=None):
+        """Play text; set `cancelled` (or call stop()) to cut it off."""
+        if cancelled is None:
+            cancelled = threading.Event()
+        self._cancelled = cancelled
+        pcm = self.cache.get(text)
+        if not cancelled.is_set():
+            self.sink.play(pcm, cancelled)
+
+    def stop(self):
+        self._cancelled.set()
+
+
+def make_speaker(vocabulary=()):
+    """
+    CachedSpeaker with `vocabulary` pre-rendered in the background, or
+    speech.default_speaker() when espeak or an audio sink is unavailable.
+    """
+    if shutil.which("espeak"):
+        try:
+            speaker = CachedSpeaker(PhraseCache())
+        except Exception as e:
+            print(f"Phrase cache unavailable ({e}), synthesising each alert")
+        else:
+            speaker.cache.preload(vocabulary)
+            return speaker
+    return default_speaker()
+
+
+def preload_vocabulary(speaker, phrases):
+    """Add phrases to a CachedSpeaker's fixed set (no-op for other speakers)."""
+    if isinstance(speaker, CachedSpeaker):
+        speaker.cache.preload(phrases)
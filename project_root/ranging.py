@@ -0,0 +1,264 @@
+import statistics
+import threading
+import time
+from collections import namedtuple
+
+from median_filter import RollingMedian
+from sound_speed import DistanceConverter
+
+# ========================================
+# HC-SR04 RANGING (edge-triggered)
+# ========================================
+# Echo timing is done with GPIO edge callbacks instead of spinning on
+# GPIO.input(), so a waiting sensor costs no CPU and the pulse width is
+# measured from callback timestamps (time.perf_counter_ns).
+
+CM_PER_NS = 17150 / 1e9     # nominal factor, only used to size timeouts
+DEFAULT_TIMEOUT = 0.1       # seconds to wait for a complete echo
+ECHO_START_LATENCY = 0.0005 # trigger -> echo rise (8-cycle 40 kHz burst + margin)
+
+
+def echo_timeout_for_range(max_range_cm):
+    """Shortest echo wait (s) that still covers a target at max_range_cm."""
+    return max_range_cm / (CM_PER_NS * 1e9) + ECHO_START_LATENCY
+
+
+class EdgeTimedSensor:
+    """
+    One HC-SR04 channel driven through a GPIOBackend.
+
+    Pass max_range_cm to derive the echo timeout from the range we care
+    about (~12 ms for 200 cm) instead of a fixed 20-100 ms wait. A ping
+    whose echo started but did not finish in time sets `out_of_range`.
+
+    Pulse widths are converted with a DistanceConverter (temperature
+    compensated); several sensors can share one converter.
+    """
+
+    def __init__(self, backend, trig, echo, timeout=DEFAULT_TIMEOUT, max_range_cm=None, converter=None):
+        self.backend = backend
+        self.converter = converter if converter is not None else DistanceConverter()
+        self.trig = trig
+        self.echo = echo
+        self.max_range_cm = max_range_cm
+        self.timeout = echo_timeout_for_range(max_range_cm) if max_range_cm else timeout
+        self.out_of_range = False
+
+        self._rise_ns = None
+        self._fall_ns = None
+        self._armed = False         # between trigger and the second edge
+        self._done = threading.Event()
+
+        backend.setup_output(trig, initial=False)
+        backend.setup_input(echo)
+        backend.add_edge_callback(echo, self._on_edge)
+
+    def _on_edge(self, pin, level, t_ns):
+        # Edges are told apart by order after the trigger (rise, then fall),
+        # not by `level`: RPi.GPIO reads the pin in a callback that can run
+        # after a short (close-range) echo has already ended
+        if not self._armed:
+            return
+        if self._rise_ns is None:
+            self._rise_ns = t_ns
+        else:
+            self._fall_ns = t_ns
+            self._armed = False
+            self._done.set()
+
+    def ping_ns(self):
+        """Fire one ping and return the echo width in ns, or None on timeout."""
+        self._rise_ns = None
+        self._fall_ns = None
+        self._done.clear()
+        self._armed = True
+
+        self.backend.pulse(self.trig)
+
+        if not self._done.wait(self.timeout):
+            self._armed = False
+            self.out_of_range = self._rise_ns is not None
+            return None
+        self.out_of_range = False
+        return self._fall_ns - self._rise_ns
+
+    def ready(self):
+        """False while the echo line is still high from an earlier ping."""
+        return not self.backend.input(self.echo)
+
+    def measure_distance(self):
+        """Single-ping distance in cm (rounded to 2 dp), or None on timeout."""
+        width_ns = self.ping_ns()
+        if width_ns is None:
+            return None
+        return round(width_ns * self.converter.cm_per_ns, 2)
+
+    def close(self):
+        self.backend.remove_edge_callback(self.echo)
+
+
+# ========================================
+# BATCH MEDIAN WITH QUORUM
+# ========================================
+# quality = valid / samples; distance is None when fewer than `quorum`
+# pings came back, instead of discarding the batch on the first timeout.
+MedianResult = namedtuple("MedianResult", ["distance", "valid", "dropped", "quality"])
+
+
+def sample_median(sensor, samples=5, quorum=3, interval=0.05):
+    """Median of up to `samples` pings, tolerating timeouts down to `quorum`."""
+    readings = []
+    dropped = 0
+    for i in range(samples):
+        distance = sensor.measure_distance()
+        if distance is None:
+            dropped += 1
+            # Stop early once the quorum can no longer be reached
+            if samples - dropped < quorum:
+                break
+        else:
+            readings.append(distance)
+        if i < samples - 1:
+            time.sleep(interval)
+
+    median = round(statistics.median(readings), 2) if len(readings) >= quorum else None
+    return MedianResult(median, len(readings), dropped, len(readings) / samples)
+
+
+# ========================================
+# MULTI-SENSOR SCHEDULER
+# ========================================
+# distance is the raw ping (None on timeout), filtered the rolling median
+# (None below quorum) and quality the fraction of valid pings in the window
+Reading = namedtuple("Reading", ["seq", "channel", "distance", "filtered", "quality", "t_ns"])
+
+
+class ReadingRing:
+    """Fixed-size, thread-safe ring buffer of Readings shared by consumers."""
+
+    def __init__(self, size=256):
+        self.size = size
+        self._buf = [None] * size
+        self._seq = 0
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def append(self, channel, distance, filtered, quality, t_ns):
+        with self._lock:
+            reading = Reading(self._seq, channel, distance, filtered, quality, t_ns)
+            self._buf[self._seq % self.size] = reading
+            self._latest[channel] = reading
+            self._seq += 1
+        return reading
+
+    def latest(self, channel):
+        """Most recent Reading for a channel, or None if it never reported."""
+        with self._lock:
+            return self._latest.get(channel)
+
+    def recent(self, channel, n):
+        """Up to n most recent Readings for a channel, oldest first."""
+        out = []
+        with self._lock:
+            seq = self._seq - 1
+            oldest = max(0, self._seq - self.size)
+            while seq >= oldest and len(out) < n:
+                reading = self._buf[seq % self.size]
+                if reading.channel == channel:
+                    out.append(reading)
+                seq -= 1
+        out.reverse()
+        return out
+
+    def since(self, seq):
+        """All Readings with a sequence number >= seq that are still buffered."""
+        with self._lock:
+            start = max(seq, self._seq - self.size)
+            return [self._buf[i % self.size] for i in range(start, self._seq)]
+
+    @property
+    def total(self):
+        """Readings appended so far, including ones already overwritten."""
+        with self._lock:
+            return self._seq
+
+
+class RangingScheduler:
+    """
+    Long-lived thread that owns N sensors and fires them one at a time on a
+    staggered slot plan: slot k belongs to channel k % N and every slot lasts
+    1 / rate_hz seconds. Only one sensor is ever pinging, so there is no
+    acoustic crosstalk, and the aggregate rate stays fixed however many
+    sensors are attached (e.g. 40 Hz total = 10 Hz each for 4 sensors).
+
+    Every ping also updates a per-channel RollingMedian, so each Reading
+    carries a filtered value without waiting for a new batch of samples.
+    Timeouts count against the window's quality rather than resetting it;
+    the filtered value is only reported while `quorum` pings are valid.
+
+    With rate_hz=None the scheduler free-runs: as soon as a ping returns (or
+    hits its range-derived timeout) the next sensor fires after `guard_s`,
+    so short max ranges directly raise the achievable ping rate. Sensors
+    whose echo line is still high from an out-of-range ping are skipped.
+    """
+
+    def __init__(self, sensors, rate_hz=40.0, ring=None, filter_window=5, quorum=3, guard_s=0.002):
+        self.sensors = list(sensors)
+        self.quorum = quorum
+        self.slot_ns = int(1e9 / rate_hz) if rate_hz else None
+        self.guard_s = guard_s
+        self.filters = [RollingMedian(filter_window) for _ in self.sensors]
+        self.ring = ring if ring is not None else ReadingRing()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="RangingScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        slot = 0
+        next_slot_ns = time.perf_counter_ns()
+        while not self._stop.is_set():
+            channel = slot % len(self.sensors)
+            slot += 1
+            sensor = self.sensors[channel]
+            sensor.converter.maybe_refresh()
+            if sensor.ready():
+                self._ping(channel, sensor)
+
+            if self.slot_ns is None:
+                self._stop.wait(self.guard_s)
+                continue
+
+            next_slot_ns += self.slot_ns
+            wait_ns = next_slot_ns - time.perf_counter_ns()
+            if wait_ns > 0:
+                self._stop.wait(wait_ns / 1e9)
+            else:
+                # Fell behind (e.g. long timeouts); re-anchor instead of bursting
+                next_slot_ns = time.perf_counter_ns()
+
+    def _ping(self, channel, sensor):
+        t_ns = time.perf_counter_ns()
+        try:
+            distance = sensor.measure_distance()
+        except Exception as e:
+            print(f"Ranging error on channel {channel}: {e}")
+            distance = None
+
+        median = self.filters[channel]
+        filtered = median.update(distance)
+        if median.valid < self.quorum:
+            filtered = None
+        elif filtered is not None:
+            filtered = round(filtered, 2)
+        quality = median.valid / len(median)
+        self.ring.append(channel, distance, filtered, quality, t_ns)
@@ -0,0 +1,107 @@
+import itertools
+import math
+import time
+
+# ========================================
+# TEMPERATURE-COMPENSATED SPEED OF SOUND
+# ========================================
+# The old scripts used a fixed 17150 cm/s (half of ~343 m/s, i.e. ~20 °C).
+# Outdoors in Malaysia (30+ °C, humid) sound is ~2% faster, so distances
+# read short. DistanceConverter keeps the current cm-per-ns factor in one
+# attribute taken from a precomputed table, so the per-ping conversion
+# stays a single multiply: distance_cm = width_ns * converter.cm_per_ns.
+
+TABLE_MIN_C = -20.0
+TABLE_MAX_C = 60.0
+TABLE_STEP_C = 0.1
+HUMIDITY_STEP = 10              # % RH buckets: 0, 10, ..., 100
+
+DEFAULT_TEMP_C = 20.0
+DEFAULT_HUMIDITY = 50.0
+
+
+def speed_of_sound(temp_c, humidity=DEFAULT_HUMIDITY):
+    """Speed of sound in air (m/s) for a temperature (°C) and relative humidity (%)."""
+    return 331.3 * math.sqrt(1 + temp_c / 273.15) + 0.0124 * humidity
+
+
+def _cm_per_ns(temp_c, humidity):
+    # Echo width covers the round trip, so halve it
+    return speed_of_sound(temp_c, humidity) * 100 / 2 / 1e9
+
+
+def _build_table():
+    steps = int(round((TABLE_MAX_C - TABLE_MIN_C) / TABLE_STEP_C)) + 1
+    return [
+        [_cm_per_ns(TABLE_MIN_C + i * TABLE_STEP_C, h) for i in range(steps)]
+        for h in range(0, 101, HUMIDITY_STEP)
+    ]
+
+
+CM_PER_NS_TABLE = _build_table()
+
+
+def lookup_cm_per_ns(temp_c, humidity=DEFAULT_HUMIDITY):
+    """cm-per-ns factor from the precomputed table (clamped to its range)."""
+    temp_c = min(max(temp_c, TABLE_MIN_C), TABLE_MAX_C)
+    humidity = min(max(humidity, 0), 100)
+    row = CM_PER_NS_TABLE[int(round(humidity / HUMIDITY_STEP))]
+    return row[int(round((temp_c - TABLE_MIN_C) / TABLE_STEP_C))]
+
+
+# ========================================
+# TEMPERATURE SOURCES
+# ========================================
+# Anything with a read() -> (temp_c, humidity) method can feed a converter,
+# e.g. a wrapper around a DHT22 driver.
+
+class FixedTemperature:
+    """Configured ambient conditions."""
+
+    def __init__(self, temp_c=DEFAULT_TEMP_C, humidity=DEFAULT_HUMIDITY):
+        self.temp_c = temp_c
+        self.humidity = humidity
+
+    def read(self):
+        return self.temp_c, self.humidity
+
+
+class SimulatedTemperature:
+    """Replays scripted (temp_c, humidity) readings for tests, looping forever."""
+
+    def __init__(self, readings):
+        self._readings = itertools.cycle(list(readings))
+
+    def read(self):
+        return next(self._readings)
+
+
+class DistanceConverter:
+    """Holds the current cm-per-ns factor and refreshes it from a temperature source."""
+
+    def __init__(self, source=None, refresh_s=60.0):
+        self.source = source if source is not None else FixedTemperature()
+        self.refresh_s = refresh_s
+        self.temp_c = DEFAULT_TEMP_C
+        self.humidity = DEFAULT_HUMIDITY
+        self.cm_per_ns = lookup_cm_per_ns(self.temp_c, self.humidity)
+        self._next_refresh = 0.0
+        self.refresh()
+
+    def refresh(self):
+        self._next_refresh = time.monotonic() + self.refresh_s
+        try:
+            temp_c, humidity = self.source.read()
+        except Exception as e:
+            print(f"Temperature source error: {e}")
+            return
+        if temp_c is None:
+            return
+        self.temp_c = temp_c
+        self.humidity = humidity if humidity is not None else DEFAULT_HUMIDITY
+        self.cm_per_ns = lookup_cm_per_ns(self.temp_c, self.humidity)
+
+    def maybe_refresh(self):
+        """Refresh if the interval has passed; call from the ranging loop, not per ping."""
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import shutil
+import subprocess
+import threading
+import time
+
+# ========================================
+# PREEMPTIVE SPEECH SCHEDULER
+# ========================================
+# One thread speaks; callers never block. Compared to a plain PriorityQueue:
+#   - preemption: a message with a more urgent priority (lower number) than
+#     the one being spoken interrupts it, so "Stop" is not stuck behind
+#     "chair, tv detected"
+#   - coalescing: messages with the same key replace each other, queued or
+#     playing (only the latest distance band matters), and a message equal to
+#     the one already queued or playing is dropped. Keys are for latest-wins
+#     values only; distinct facts (object announcements) use key=None
+#   - max age: messages not started within max_age_s are discarded as stale
+#
+# Each queued message carries its own cancel Event, passed to
+# speaker.play(text, cancelled). Interrupting sets that Event under the
+# scheduler lock before calling speaker.stop(), so a message the worker has
+# picked but not yet started is never played.
+#
+# Speakers: EspeakSpeaker runs espeak as a child process and interrupts it
+# by terminating the process; Pyttsx3Speaker interrupts with engine.stop(),
+# which not every pyttsx3 driver honours mid-sentence.
+
+
+class EspeakSpeaker:
+    def __init__(self, args=("espeak",)):
+        self.args = list(args)
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def play(self, text, cancelled=None):
+        with self._lock:
+            # Checked under the lock stop() takes, so a cancel cannot fall between check and spawn
+            if cancelled is not None and cancelled.is_set():
+                return
+            self._proc = subprocess.Popen(self.args + [text], stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.DEVNULL)
+            proc = self._proc
+        proc.wait()
+
+    def stop(self):
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                self._proc.terminate()
+
+
+class Pyttsx3Speaker:
+    def __init__(self, rate=150, volume=1.0):
+        import pyttsx3
+        self.engine = pyttsx3.init()
+        self.engine.setProperty("rate", rate)
+        self.engine.setProperty("volume", volume)
+
+    def play(self, text, cancelled=None):
+        if cancelled is not None and cancelled.is_set():
+            return
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+    def stop(self):
+        self.engine.stop()
+
+
+def default_speaker():
+    """espeak if installed (interruptible), else pyttsx3."""
+    if shutil.which("espeak"):
+        return EspeakSpeaker()
+    try:
+        return Pyttsx3Speaker()
+    except Exception:
+        # Nothing usable: keep running, each message reports its TTS error
+        return EspeakSpeaker()
+
+
+class SpeechScheduler:
+    def __init__(self, speaker=None, max_age_s=2.0, name="speech"):
+        self.speaker = speaker if speaker is not None else default_speaker()
+        self.max_age_s = max_age_s
+        self.spoken = 0
+        self.interrupted = 0
+        self.expired = 0
+        self.coalesced = 0
+        self._heap = []                 # (priority, seq, item)
+        self._seq = itertools.count()
+        self._by_key = {}               # key -> queued item
+        self._current = None
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def say(self, text, priority=5, key=None, max_age_s=None):
+        """Queue text; lower priority number = more urgent. Never blocks."""
+        now = time.monotonic()
+        item = {
+            "text": text,
+            "priority": priority,
+            "key": key,
+            "expires": now + (self.max_age_s if max_age_s is None else max_age_s),
+            "cancelled": False,         # dropped from the queue
+            "interrupt": threading.Event(),     # stop playing (set once started too)
+        }
+        interrupt = False
+        with self._cond:
+            current = self._current
+            if current is not None and current["text"] == text:
+                self.coalesced += 1
+                return
+            if key is not None:
+                queued = self._by_key.get(key)
+                if queued is not None:
+                    if queued["text"] == text:
+                        queued["expires"] = item["expires"]
+                        self.coalesced += 1
+                        return
+                    queued["cancelled"] = True
+                    self.coalesced += 1
+                # A newer message for the same key also supersedes the one playing
+                if current is not None and current["key"] == key:
+                    interrupt = True
+                self._by_key[key] = item
+            if current is not None and priority < current["priority"]:
+                interrupt = True
+            heapq.heappush(self._heap, (priority, next(self._seq), item))
+            self._cond.notify()
+            if interrupt:
+                # The worker may have taken `current` but not started it yet: its own
+                # Event stops it either way, speaker.stop() cuts off audio already playing
+                self.interrupted += 1
+                current["interrupt"].set()
+                self.speaker.stop()
+
+    def stop(self, timeout=2.0):
+        with self._cond:
+            self._stop = True
+            if self._current is not None:
+                self._current["interrupt"].set()
+            self._cond.notify()
+        self.speaker.stop()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _next_item(self):
+        # Caller holds the lock; drops cancelled and stale entries
+        now = time.monotonic()
+        while self._heap:
+            _, _, item = heapq.heappop(self._heap)
+            if item["key"] is not None and self._by_key.get(item["key"]) is item:
+                del self._by_key[item["key"]]
+            if item["cancelled"]:
+                continue
+            if now > item["expires"]:
+                self.expired += 1
+                continue
+            return item
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                item = self._next_item()
+                while item is None and not self._stop:
+                    self._cond.wait()
+                    item = self._next_item()
+                if self._stop:
+                    return
+                self._current = item
+            try:
+                self.speaker.play(item["text"], item["interrupt"])
+                self.spoken += 1
+            except Exception as e:
+                print(f"TTS error: {e}")
+            finally:
+                with self._cond:
+                    self._current = None
@@ -0,0 +1,61 @@
+# ========================================
+# CHANGE-DRIVEN ULTRASONIC TELEMETRY
+# ========================================
+# Uploading every reading mostly stores the same number again while the
+# user stands still. DeadbandEncoder emits a record only when
+#   - the alert band (Stop/Warning/Caution/Clear) changes,
+#   - the distance moved by at least delta_cm since the last record, or
+#   - heartbeat_s passed without a record (proves the device is alive).
+# Readings in between are not lost: each record carries the min/max/mean
+# and count of every reading in its window.
+
+
+class DeadbandEncoder:
+    def __init__(self, delta_cm=10.0, heartbeat_s=60.0):
+        self.delta_cm = delta_cm
+        self.heartbeat_s = heartbeat_s
+        self.readings = 0
+        self.emitted = 0
+        self._last_distance = None
+        self._last_message = None
+        self._last_time = 0.0
+        self._reset_window()
+
+    def _reset_window(self):
+        self._count = 0
+        self._sum = 0.0
+        self._min = float("inf")
+        self._max = float("-inf")
+
+    def offer(self, distance, message, now):
+        """Feed one reading; returns a record dict to upload, or None."""
+        self.readings += 1
+        self._count += 1
+        self._sum += distance
+        self._min = min(self._min, distance)
+        self._max = max(self._max, distance)
+
+        if self._last_distance is None or message != self._last_message:
+            reason = "band"
+        elif abs(distance - self._last_distance) >= self.delta_cm:
+            reason = "delta"
+        elif now - self._last_time >= self.heartbeat_s:
+            reason = "heartbeat"
+        else:
+            return None
+
+        record = {
+            "distance_cm": distance,
+            "message": message,
+            "reason": reason,
+            "samples": self._count,
+            "min_cm": round(self._min, 2),
+            "max_cm": round(self._max, 2),
+            "mean_cm": round(self._sum / self._count, 2),
+        }
+        self._last_distance = distance
+        self._last_message = message
+        self._last_time = now
+        self._reset_window()
+        self.emitted += 1
+        return record
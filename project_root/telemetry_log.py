@@ -0,0 +1,192 @@
+import argparse
+import datetime
+import os
+import struct
+import threading
+
+import numpy as np
+
+from detection_post import DETECTION_DTYPE
+from fusion import BANDS, CLEAR
+
+# ========================================
+# COMPACT BINARY TELEMETRY LOG
+# ========================================
+# Every reading is appended locally in a packed binary form instead of the
+# JSON dicts we upload (string timestamps, repeated class names, bbox lists):
+#   range record:     <B type=1><q epoch ms><f distance cm><B band id>       14 bytes
+#   detection record: <B type=2><q epoch ms><H n> + n x DETECTION_DTYPE      11 + 14n bytes
+# One file per local day (<dir>/YYYY-MM-DD.bin), written through a buffer.
+# Write errors (disk full, SD card I/O) are counted in `dropped` and never
+# raised into the sensing threads that log.
+#
+# rollup() turns a finished day into columnar files (NumPy .npz always,
+# Parquet too if pyarrow is installed) for analysis:
+#   python telemetry_log.py rollup <dir>
+
+RANGE, DETECTIONS = 1, 2
+BAND_NAMES = tuple(message for _, message, _ in BANDS) + (CLEAR[0],)
+BAND_IDS = {name: i for i, name in enumerate(BAND_NAMES)}
+
+DEFAULT_LOG_DIR = os.environ.get(
+    "SIDP_TELEMETRY_DIR", os.path.join(os.path.expanduser("~"), ".local", "share", "sidp_telemetry")
+)
+
+_RANGE = struct.Struct("<BqfB")
+_DET_HEADER = struct.Struct("<BqH")
+
+RANGE_COLUMNS = np.dtype([("t_ms", np.int64), ("distance", np.float32), ("band", np.uint8)])
+DETECTION_COLUMNS = np.dtype([
+    ("t_ms", np.int64),
+    ("cls", np.int16),
+    ("conf", np.float32),
+    ("bbox", np.int16, (4,)),
+])
+
+
+class TelemetryLog:
+    def __init__(self, directory=None, tz=None, buffer_bytes=64 * 1024):
+        self.directory = directory or DEFAULT_LOG_DIR
+        self.tz = tz                        # day boundaries in this zone (None = local time)
+        self.buffer_bytes = buffer_bytes
+        self.dropped = 0                    # records lost to write errors
+        self._file = None
+        self._day_end_ms = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _open_for(self, t_ms):
+        # Called with the lock held when t_ms crosses into a new day
+        if self._file is not None:
+            file, self._file = self._file, None
+            file.close()
+        day = datetime.datetime.fromtimestamp(t_ms / 1000, self.tz).date()
+        end = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time(), self.tz)
+        self._day_end_ms = int(end.timestamp() * 1000)
+        path = os.path.join(self.directory, f"{day.isoformat()}.bin")
+        self._file = open(path, "ab", buffering=self.buffer_bytes)
+
+    def _write(self, t_ms, data):
+        with self._lock:
+            try:
+                if self._file is None or t_ms >= self._day_end_ms:
+                    self._open_for(t_ms)
+                self._file.write(data)
+            except OSError as e:
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    print(f"Telemetry log write failed ({self.dropped} records dropped): {e}")
+
+    def log_range(self, t_ms, distance, message):
+        self._write(t_ms, _RANGE.pack(RANGE, t_ms, distance, BAND_IDS[message]))
+
+    def log_detections(self, t_ms, dets):
+        dets = np.ascontiguousarray(dets, dtype=DETECTION_DTYPE)
+        self._write(t_ms, _DET_HEADER.pack(DETECTIONS, t_ms, len(dets)) + dets.tobytes())
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_log(path):
+    """Decode one .bin file into (ranges, detections) columnar arrays."""
+    with open(path, "rb") as f:
+        buf = f.read()
+
+    ranges = []
+    det_times = []
+    det_chunks = []
+    pos = 0
+    while pos < len(buf):
+        kind = buf[pos]
+        if kind == RANGE:
+            if pos + _RANGE.size > len(buf):
+                break                       # truncated tail (power cut mid-write)
+            _, t_ms, distance, band = _RANGE.unpack_from(buf, pos)
+            ranges.append((t_ms, distance, band))
+            pos += _RANGE.size
+        elif kind == DETECTIONS:
+            if pos + _DET_HEADER.size > len(buf):
+                break
+            _, t_ms, n = _DET_HEADER.unpack_from(buf, pos)
+            pos += _DET_HEADER.size
+            end = pos + n * DETECTION_DTYPE.itemsize
+            if end > len(buf):
+                break
+            det_chunks.append(np.frombuffer(buf, dtype=DETECTION_DTYPE, count=n, offset=pos))
+            det_times.append(np.full(n, t_ms, dtype=np.int64))
+            pos = end
+        else:
+            raise ValueError(f"{path}: unknown record type {kind} at byte {pos}")
+
+    range_arr = np.array(ranges, dtype=RANGE_COLUMNS)
+    dets = np.concatenate(det_chunks) if det_chunks else np.empty(0, DETECTION_DTYPE)
+    det_arr = np.empty(len(dets), dtype=DETECTION_COLUMNS)
+    det_arr["t_ms"] = np.concatenate(det_times) if det_times else np.empty(0, np.int64)
+    for field in DETECTION_DTYPE.names:
+        det_arr[field] = dets[field]
+    return range_arr, det_arr
+
+
+def _write_parquet(path, columns):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return False
+    table = pa.table({
+        name: (col.tolist() if col.ndim > 1 else col) for name, col in columns.items()
+    })
+    pq.write_table(table, path)
+    return True
+
+
+def rollup(path, out_dir=None):
+    """Write <day>.npz (and <day>_range/_detections.parquet if pyarrow exists) for one .bin file."""
+    out_dir = out_dir or os.path.dirname(path)
+    day = os.path.splitext(os.path.basename(path))[0]
+    ranges, dets = read_log(path)
+
+    np.savez_compressed(
+        os.path.join(out_dir, f"{day}.npz"),
+        range_t_ms=ranges["t_ms"], range_distance=ranges["distance"], range_band=ranges["band"],
+        det_t_ms=dets["t_ms"], det_cls=dets["cls"], det_conf=dets["conf"], det_bbox=dets["bbox"],
+    )
+    _write_parquet(os.path.join(out_dir, f"{day}_range.parquet"),
+                   {name: ranges[name] for name in RANGE_COLUMNS.names})
+    _write_parquet(os.path.join(out_dir, f"{day}_detections.parquet"),
+                   {name: dets[name] for name in DETECTION_COLUMNS.names})
+    return len(ranges), len(dets)
+
+
+def rollup_directory(directory, include_today=False, tz=None):
+    """Roll up every finished day that has no .npz yet."""
+    today = datetime.datetime.now(tz).date().isoformat()
+    for name in sorted(os.listdir(directory)):
+        day, ext = os.path.splitext(name)
+        if ext != ".bin" or (day == today and not include_today):
+            continue
+        if os.path.exists(os.path.join(directory, f"{day}.npz")):
+            continue
+        n_range, n_dets = rollup(os.path.join(directory, name))
+        print(f"{day}: {n_range} range readings, {n_dets} detections")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telemetry log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("rollup", help="write columnar files for finished days")
+    p.add_argument("directory", nargs="?", default=DEFAULT_LOG_DIR)
+    p.add_argument("--include-today", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "rollup":
+        rollup_directory(args.directory, include_today=args.include_today)
@@ -0,0 +1,205 @@
+import itertools
+import threading
+
+import numpy as np
+
+# ========================================
+# MULTI-OBJECT TRACKER (SORT-style, NumPy only)
+# ========================================
+# Each track runs a constant-velocity Kalman filter on [cx, cy, area, aspect]
+# and detections are associated to tracks greedily by IoU (same class only).
+# Tracks get stable ids, so two chairs stay two chairs, and boxes_at(t)
+# extrapolates every track to the display time, so frames without inference
+# still show boxes that move smoothly instead of stale ones.
+#
+# Time is in seconds (time.time()), so velocities are per second and the
+# filter copes with irregular inference intervals.
+
+TRACK_DTYPE = np.dtype([
+    ("id", np.int32),
+    ("cls", np.int16),
+    ("conf", np.float32),
+    ("bbox", np.int16, (4,)),   # x1, y1, x2, y2
+    ("hits", np.int32),         # number of detections matched to this track
+])
+
+_MEASUREMENT = np.hstack([np.eye(4), np.zeros((4, 3))])
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_Q_PER_S = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001]) * 30.0   # SORT's per-frame noise at 30 fps
+
+
+def _bbox_to_z(bbox):
+    x1, y1, x2, y2 = (float(v) for v in bbox)
+    w, h = max(x2 - x1, 1.0), max(y2 - y1, 1.0)
+    return np.array([x1 + w / 2, y1 + h / 2, w * h, w / h])
+
+
+def _x_to_bbox(x):
+    area, aspect = max(x[2], 1.0), max(x[3], 1e-3)
+    w = np.sqrt(area * aspect)
+    h = area / w
+    return np.array([x[0] - w / 2, x[1] - h / 2, x[0] + w / 2, x[1] + h / 2])
+
+
+def _transition(dt):
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = dt
+    return F
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, cls, conf, bbox, now):
+        self.id = track_id
+        self.cls = int(cls)
+        self.conf = float(conf)
+        self.hits = 1
+        self.time = now             # time the state refers to
+        self.last_update = now
+        self.missed = False         # the last inference that covered it found no match
+        self.x = np.zeros(7)
+        self.x[:4] = _bbox_to_z(bbox)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+    def predict(self, now):
+        dt = max(now - self.time, 0.0)
+        if dt == 0.0:
+            return
+        if self.x[2] + self.x[6] * dt <= 0:
+            self.x[6] = 0.0
+        F = _transition(dt)
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + _Q_PER_S * dt
+        self.time = now
+
+    def update(self, cls, conf, bbox, now):
+        z = _bbox_to_z(bbox)
+        H = _MEASUREMENT
+        y = z - H @ self.x
+        S = H @ self.P @ H.T + _R
+        K = self.P @ H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ H) @ self.P
+        self.cls = int(cls)
+        self.conf = float(conf)
+        self.hits += 1
+        self.last_update = now
+        self.missed = False
+
+    def hold(self, now):
+        """
+        Nothing changed around this track: keep it where it is, without a hit.
+        It only stays alive if the last inference that covered it saw it; a
+        missed track keeps ageing, so objects that left still expire.
+        """
+        self.predict(now)
+        self.x[4:] = 0.0
+        if not self.missed:
+            self.last_update = now
+
+    def bbox_at(self, now):
+        """Extrapolated box at `now` without changing the filter state."""
+        return _x_to_bbox(_transition(max(now - self.time, 0.0)) @ self.x)
+
+
+class Tracker:
+    def __init__(self, iou_threshold=0.3, max_age_s=1.0, min_hits=1):
+        self.iou_threshold = iou_threshold
+        self.max_age_s = max_age_s          # drop tracks unseen for this long
+        self.min_hits = min_hits            # hits before a track is reported
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def update(self, dets, now, roi=None):
+        """
+        Feed one inference result (DETECTION_DTYPE array, may be empty) taken
+        at time `now`; returns the reported tracks as a TRACK_DTYPE array.
+        With roi=(x1, y1, x2, y2) the model only saw that crop: dets must be
+        the fresh ones from inside it, and tracks entirely outside are held.
+        """
+        with self._lock:
+            for track in self.tracks:
+                track.predict(now)
+
+            active = self.tracks
+            if roi is not None:
+                x1, y1, x2, y2 = roi
+                active = []
+                for track in self.tracks:
+                    bx1, by1, bx2, by2 = _x_to_bbox(track.x)
+                    if bx2 <= x1 or bx1 >= x2 or by2 <= y1 or by1 >= y2:
+                        track.hold(now)
+                    else:
+                        active.append(track)
+
+            matched_tracks = set()
+            matched_dets = set()
+            if len(active) and len(dets):
+                predicted = np.array([_x_to_bbox(t.x) for t in active])
+                iou = iou_matrix(predicted, dets["bbox"])
+                same_cls = np.array([t.cls for t in active])[:, None] == dets["cls"][None, :]
+                iou = np.where(same_cls, iou, 0.0)
+
+                # Greedy: best remaining pair first
+                for flat in np.argsort(iou, axis=None)[::-1]:
+                    ti, di = np.unravel_index(flat, iou.shape)
+                    if iou[ti, di] < self.iou_threshold:
+                        break
+                    if ti in matched_tracks or di in matched_dets:
+                        continue
+                    det = dets[di]
+                    active[ti].update(det["cls"], det["conf"], det["bbox"], now)
+                    matched_tracks.add(ti)
+                    matched_dets.add(di)
+
+            for ti, track in enumerate(active):
+                if ti not in matched_tracks:
+                    track.missed = True
+
+            for di in range(len(dets)):
+                if di not in matched_dets:
+                    det = dets[di]
+                    self.tracks.append(Track(next(self._ids), det["cls"], det["conf"], det["bbox"], now))
+
+            self._expire(now)
+            return self._snapshot(now)
+
+    def hold(self, now):
+        """
+        The scene did not change (motion gate skipped inference): keep every
+        track where it is, without counting a hit (see Track.hold).
+        """
+        with self._lock:
+            for track in self.tracks:
+                track.hold(now)
+            self._expire(now)
+
+    def boxes_at(self, now):
+        """Reported tracks extrapolated to `now` (for frames without inference)."""
+        with self._lock:
+            return self._snapshot(now)
+
+    def _expire(self, now):
+        self.tracks = [t for t in self.tracks if now - t.last_update <= self.max_age_s]
+
+    def _snapshot(self, now):
+        live = [t for t in self.tracks if t.hits >= self.min_hits]
+        out = np.empty(len(live), dtype=TRACK_DTYPE)
+        for i, t in enumerate(live):
+            out[i] = (t.id, t.cls, t.conf, np.round(t.bbox_at(now)).astype(np.int16), t.hits)
+        return out
@@ -1,77 +1,89 @@
-import RPi.GPIO as GPIO
 import time
-import os
 
-# === GPIO SETUP ===
-GPIO.setmode(GPIO.BOARD)
+from gpio_backend import get_backend
+from sound_speed import DistanceConverter, FixedTemperature
+from ranging import EdgeTimedSensor, sample_median
+from speech import SpeechScheduler
+from phrase_cache import alert_vocabulary, make_speaker
 
 # Pins for the ultrasonic sensor
 TRIG = 11  # GPIO 17
 ECHO = 12  # GPIO 18
 
-GPIO.setup(TRIG, GPIO.OUT)
-GPIO.setup(ECHO, GPIO.IN)
+AMBIENT_TEMP_C = 30.0   # outdoor Malaysia
+AMBIENT_HUMIDITY = 80.0
 
-GPIO.output(TRIG, False)
-print("Waiting for sensor to settle...")
-time.sleep(2)
 
 # === FUNCTION TO MEASURE DISTANCE ===
-def measure_distance():
-    # Send a 10μs pulse
-    GPIO.output(TRIG, True)
-    time.sleep(0.00001)
-    GPIO.output(TRIG, False)
-
-    pulse_start = time.time()
-    pulse_end = time.time()
-
-    # Wait for echo to go high
-    while GPIO.input(ECHO) == 0:
-        pulse_start = time.time()
-
-    # Wait for echo to go low
-    while GPIO.input(ECHO) == 1:
-        pulse_end = time.time()
-
-    pulse_duration = pulse_end - pulse_start
-    distance = pulse_duration * 17150  # Convert to cm
-    distance = round(distance, 2)
-    return distance
-
-
-# === MAIN LOOP ===
-try:
-    last_message = None
-    last_announce_time = 0
-    announce_interval = 2  # seconds between TTS messages
-
-    while True:
-        distance = measure_distance()
-        print(f"Distance: {distance} cm")
-
-        current_time = time.time()
-
-        # === Threshold logic ===
-        if distance < 50:
-            message = "Stop"
-        elif distance < 100:
-            message = "Warning, object ahead"
-        elif distance < 200:
-            message = "Caution"
-        else:
-            message = None
-
-        # === Speak only if message changes or interval passes ===
-        if message and (message != last_message or current_time - last_announce_time > announce_interval):
-            os.system(f"espeak '{message}'")
-            last_message = message
-            last_announce_time = current_time
-
-        time.sleep(1)
-
-except KeyboardInterrupt:
-    print("Stopped by user")
-
-finally:
-    GPIO.cleanup()
+# Median of 5 pings; a few timeouts are tolerated as long as 3 pings return
+def measure_distance(sensor, samples=5, quorum=3):
+    result = sample_median(sensor, samples=samples, quorum=quorum)
+    if result.dropped:
+        print(f"Dropped {result.dropped}/{samples} pings (quality {result.quality:.0%})")
+    return result.distance
+
+
+def run_ultrasonic(backend=None):
+    """
+    Ultrasonic distance warning loop. Nothing touches GPIO until this is
+    called; the backend defaults to get_backend() (SIDP_GPIO_BACKEND=sim
+    runs it off a Pi).
+    """
+    # === GPIO SETUP ===
+    backend = backend if backend is not None else get_backend()
+
+    # Echo edges are timestamped by interrupt callbacks (no busy-wait)
+    converter = DistanceConverter(FixedTemperature(AMBIENT_TEMP_C, AMBIENT_HUMIDITY))
+    sensor = EdgeTimedSensor(backend, TRIG, ECHO, converter=converter)
+    # Band words are pre-rendered to PCM (no espeak fork per alert)
+    speech = SpeechScheduler(make_speaker(alert_vocabulary() + ["object ahead"])).start()
+    print("Waiting for sensor to settle...")
+    time.sleep(2)
+
+    # === MAIN LOOP ===
+    try:
+        last_message = None
+        last_announce_time = 0
+        announce_interval = 2  # seconds between TTS messages
+
+        while True:
+            converter.maybe_refresh()
+            distance = measure_distance(sensor)
+            if distance is None:
+                print("No reading (timeout)")
+                time.sleep(1)
+                continue
+            print(f"Distance: {distance} cm")
+
+            current_time = time.time()
+
+            # === Threshold logic ===
+            if distance < 50:
+                message = "Stop"
+            elif distance < 100:
+                message = "Warning, object ahead"
+            elif distance < 200:
+                message = "Caution"
+            else:
+                message = None
+
+            # === Speak only if message changes or interval passes ===
+            if message and (message != last_message or current_time - last_announce_time > announce_interval):
+                # key="range": a newer band replaces one not yet spoken
+                speech.say(message, priority=1, key="range")
+                last_message = message
+                last_announce_time = current_time
+
+            time.sleep(1)
+
+    except KeyboardInterrupt:
+        print("Stopped by user")
+
+    finally:
+        speech.stop()
+        sensor.close()
+        backend.cleanup()
+
+
+if __name__ == "__main__":
+    run_ultrasonic()
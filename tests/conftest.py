@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules under test are flat scripts in project_root/, imported the same
+# way the camera scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project_root"))
@@ -0,0 +1,84 @@
+import sqlite3
+import time
+
+import pytest
+
+from firebase_batch import BatchUploader
+from local_rtdb import LocalRealtimeDB
+from outbox import Outbox
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.sqlite"))
+    yield box
+    box.close()
+
+
+def test_records_survive_an_offline_period(outbox):
+    db = LocalRealtimeDB()
+    db.offline = True
+    uploader = BatchUploader(db.reference("/"), flush_ms=20, outbox=outbox).start()
+    try:
+        keys = [uploader.add("ultrasonicDB", {"distance_cm": d}) for d in (10, 20, 30)]
+        assert wait_for(lambda: uploader._backoff > 0)
+        assert len(outbox) == 3 and db.writes == 0
+
+        db.offline = False
+        assert wait_for(lambda: len(outbox) == 0)
+    finally:
+        uploader.stop()
+
+    stored = db.reference("ultrasonicDB").get()
+    assert sorted(stored[key.split("/")[1]]["distance_cm"] for key in keys) == [10, 20, 30]
+    assert uploader.records == 3 and uploader.dropped == 0
+
+
+def test_backlog_from_a_previous_run_is_uploaded(tmp_path):
+    path = str(tmp_path / "outbox.sqlite")
+    db = LocalRealtimeDB()
+    db.offline = True
+    first = BatchUploader(db.reference("/"), flush_ms=20, max_records=2, outbox=Outbox(path)).start()
+    for i in range(5):
+        first.add("objects", {"n": i})
+    assert wait_for(lambda: first._backoff > 0)
+    first.stop()
+    first.outbox.close()
+
+    # Restart with the network back: the persisted records go out in batches of max_records
+    db.offline = False
+    second = BatchUploader(db.reference("/"), flush_ms=20, max_records=2, outbox=Outbox(path)).start()
+    try:
+        assert wait_for(lambda: len(second.outbox) == 0)
+    finally:
+        second.stop()
+        second.outbox.close()
+    assert sorted(r["n"] for r in db.reference("objects").get().values()) == [0, 1, 2, 3, 4]
+    assert second.batches == 3
+
+
+class FullDiskOutbox(Outbox):
+    def append(self, key, data):
+        raise sqlite3.OperationalError("database or disk is full")
+
+
+def test_outbox_write_errors_are_counted_not_raised(tmp_path):
+    db = LocalRealtimeDB()
+    outbox = FullDiskOutbox(str(tmp_path / "outbox.sqlite"))
+    uploader = BatchUploader(db.reference("/"), flush_ms=20, outbox=outbox).start()
+    try:
+        uploader.add("ultrasonicDB", {"distance_cm": 10})
+        uploader.add("ultrasonicDB", {"distance_cm": 20})
+        assert uploader.dropped == 2
+    finally:
+        uploader.stop()
+        outbox.close()
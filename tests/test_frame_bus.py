@@ -0,0 +1,53 @@
+import numpy as np
+
+from frame_bus import FrameBus
+
+
+def frame(value):
+    return np.full((4, 6, 3), value, dtype=np.uint8)
+
+
+def test_slots_are_reused_only_after_release():
+    bus = FrameBus(slots=3)
+    bus.publish(frame(1))
+    held = bus.acquire()
+    buffers = {id(buf) for buf in bus._buffers}
+
+    for value in range(2, 12):
+        assert bus.publish(frame(value)) is not None
+
+    # The held slot was never overwritten, and no new buffers were allocated
+    assert held.seq == 1
+    assert (held.array == 1).all()
+    assert {id(buf) for buf in bus._buffers} == buffers
+
+    held.release()
+    with bus.acquire() as ref:
+        assert ref.seq == bus.seq == 11
+        assert (ref.array == 11).all()
+        assert not ref.array.flags.writeable
+
+
+def test_publish_drops_when_every_free_slot_is_held():
+    bus = FrameBus(slots=2)
+    bus.publish(frame(1))
+    first = bus.acquire()
+    bus.publish(frame(2))
+    second = bus.acquire()
+
+    assert bus.publish(frame(3)) is None
+    assert bus.dropped == 1
+
+    first.release()
+    second.release()
+    assert bus.publish(frame(3)) == 3
+
+
+def test_wait_returns_only_newer_frames():
+    bus = FrameBus(slots=3)
+    bus.publish(frame(1), timestamp=10.0)
+    with bus.wait(after_seq=0, timeout=1) as ref:
+        assert (ref.seq, ref.timestamp) == (1, 10.0)
+    assert bus.wait(after_seq=1, timeout=0.01) is None
+    bus.close()
+    assert bus.wait(after_seq=1, timeout=1) is None
@@ -0,0 +1,36 @@
+import random
+import statistics
+
+import pytest
+
+from median_filter import RollingMedian
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 5, 8])
+def test_rolling_median_matches_statistics(window):
+    rng = random.Random(window)
+    median = RollingMedian(window)
+    recent = []
+    for _ in range(2000):
+        # Small integer range so duplicates exercise removal of equal values
+        value = None if rng.random() < 0.2 else rng.randint(0, 20)
+        recent = (recent + [value])[-window:]
+        valid = [v for v in recent if v is not None]
+        assert median.update(value) == (statistics.median(valid) if valid else None)
+        assert median.valid == len(valid)
+        assert len(median) == len(recent)
+
+
+def test_rolling_median_rejects_empty_window():
+    with pytest.raises(ValueError):
+        RollingMedian(0)
+
+
+def test_rolling_median_memory_stays_bounded():
+    rng = random.Random(0)
+    median = RollingMedian(5)
+    for i in range(100_000):
+        median.update(i)
+        median.update(rng.random())
+    assert len(median) == 5
+    assert len(median._sorted) <= 5
@@ -0,0 +1,28 @@
+import pytest
+
+from gpio_backend import SimulatedGPIOBackend
+from ranging import EdgeTimedSensor
+
+
+def test_edges_are_classified_by_order_not_level():
+    backend = SimulatedGPIOBackend(seed=0)
+    backend.attach_echo(23, 24, [10.0, 150.0])
+    sensor = EdgeTimedSensor(backend, 23, 24, max_range_cm=200)
+    # Report level 0 for every edge, as a late GPIO.input() read does for short echoes
+    calls = []
+    callback = backend.callbacks[24]
+    backend.callbacks[24] = lambda pin, level, t_ns: calls.append(level) or callback(pin, 0, t_ns)
+
+    assert sensor.measure_distance() == pytest.approx(10.0, abs=0.5)
+    assert sensor.measure_distance() == pytest.approx(150.0, abs=1.0)
+    assert calls == [1, 0, 1, 0]
+
+
+def test_lost_echo_times_out_and_sensor_stays_ready():
+    backend = SimulatedGPIOBackend(seed=0)
+    backend.attach_echo(23, 24, [None, 80.0])
+    sensor = EdgeTimedSensor(backend, 23, 24, max_range_cm=200)
+    assert sensor.measure_distance() is None
+    assert not sensor.out_of_range
+    assert sensor.ready()
+    assert sensor.measure_distance() == pytest.approx(80.0, abs=0.5)
@@ -0,0 +1,28 @@
+import pytest
+
+from gpio_backend import SimulatedGPIOBackend
+from ranging import EdgeTimedSensor, sample_median
+
+
+def make_sensor(distances):
+    backend = SimulatedGPIOBackend(seed=0)
+    backend.attach_echo(23, 24, distances)
+    return EdgeTimedSensor(backend, 23, 24, max_range_cm=400)
+
+
+def test_sample_median_tolerates_dropouts_down_to_quorum():
+    sensor = make_sensor([100.0, None, 102.0, None, 104.0])
+    result = sample_median(sensor, samples=5, quorum=3, interval=0)
+    assert result.distance == pytest.approx(102.0, abs=0.5)
+    assert (result.valid, result.dropped) == (3, 2)
+    assert result.quality == pytest.approx(0.6)
+
+
+def test_sample_median_stops_once_quorum_is_unreachable():
+    pings = iter([100.0, None, None, None, 100.0])
+    sensor = make_sensor(pings)
+    result = sample_median(sensor, samples=5, quorum=3, interval=0)
+    assert result.distance is None
+    assert (result.valid, result.dropped) == (1, 3)
+    # The fifth ping was never fired
+    assert next(pings) == 100.0
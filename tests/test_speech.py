@@ -0,0 +1,50 @@
+import threading
+import time
+
+from speech import SpeechScheduler
+
+
+class FakeSpeaker:
+    """Plays for `duration` seconds unless cancelled; records what finished."""
+
+    def __init__(self, duration=0.2):
+        self.duration = duration
+        self.finished = []
+        self.cut = []
+
+    def play(self, text, cancelled=None):
+        cancelled = cancelled if cancelled is not None else threading.Event()
+        (self.cut if cancelled.wait(self.duration) else self.finished).append(text)
+
+    def stop(self):
+        pass
+
+
+def run(calls, speaker):
+    speech = SpeechScheduler(speaker, max_age_s=5.0).start()
+    for delay, args in calls:
+        time.sleep(delay)
+        speech.say(*args)
+    time.sleep(1.0)
+    speech.stop()
+    return speech
+
+
+def test_object_announcements_are_not_superseded():
+    speaker = FakeSpeaker()
+    run([(0, ("chair detected", 5)), (0.05, ("person detected", 5)), (0, ("dog detected", 5))], speaker)
+    assert speaker.finished == ["chair detected", "person detected", "dog detected"]
+
+
+def test_newer_range_band_supersedes_the_playing_one():
+    speaker = FakeSpeaker()
+    run([(0, ("Caution", 3, "range")), (0.05, ("Warning", 3, "range"))], speaker)
+    assert speaker.cut == ["Caution"]
+    assert speaker.finished == ["Warning"]
+
+
+def test_more_urgent_message_preempts():
+    speaker = FakeSpeaker()
+    run([(0, ("chair detected", 5)), (0.05, ("Stop", 1, "range"))], speaker)
+    assert speaker.cut == ["chair detected"]
+    assert speaker.finished == ["Stop"]
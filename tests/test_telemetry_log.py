@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from detection_post import DETECTION_DTYPE
+from telemetry_log import TelemetryLog, read_log
+
+
+def test_round_trip(tmp_path):
+    log = TelemetryLog(str(tmp_path))
+    log.log_range(1_000, 42.5, "Stop")
+    log.log_detections(2_000, np.array([(56, 0.8, (1, 2, 3, 4))], dtype=DETECTION_DTYPE))
+    log.close()
+
+    (name,) = os.listdir(tmp_path)
+    ranges, dets = read_log(os.path.join(tmp_path, name))
+    assert ranges["t_ms"].tolist() == [1_000] and ranges["distance"][0] == 42.5
+    assert dets["cls"].tolist() == [56] and dets["bbox"].tolist() == [[1, 2, 3, 4]]
+
+
+def test_write_errors_are_counted_not_raised(tmp_path):
+    folder = tmp_path / "log"
+    log = TelemetryLog(str(folder))
+    # The directory vanished (e.g. SD card remounted): opening the day file fails
+    folder.rmdir()
+    folder.write_text("")
+    log.log_range(1_000, 42.5, "Stop")
+    log.log_range(2_000, 42.5, "Stop")
+    assert log.dropped == 2
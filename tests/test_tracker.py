@@ -0,0 +1,38 @@
+import numpy as np
+
+from detection_post import DETECTION_DTYPE
+from tracker import Tracker
+
+
+def dets(*boxes, cls=56):
+    return np.array([(cls, 0.9, box) for box in boxes], dtype=DETECTION_DTYPE)
+
+
+def test_static_scene_keeps_a_seen_track_alive():
+    tracker = Tracker(max_age_s=1.5)
+    tracker.update(dets((100, 100, 200, 200)), 0.0)
+    for step in range(1, 40):
+        tracker.hold(step * 0.1)
+    assert tracker.boxes_at(4.0)["id"].tolist() == [1]
+
+
+def test_skips_after_a_missed_detection_do_not_keep_the_track_alive():
+    tracker = Tracker(max_age_s=1.5)
+    tracker.update(dets((100, 100, 200, 200)), 0.0)
+    for step in range(1, 30):
+        tracker.hold(step * 0.1)
+    # The chair left: one inference pass without it, then the scene goes quiet
+    tracker.update(dets(), 3.0)
+    tracker.hold(3.5)
+    assert len(tracker.boxes_at(3.5)) == 1
+    for step in range(36, 180):
+        tracker.hold(step * 0.1)
+    assert len(tracker.boxes_at(18.0)) == 0
+
+
+def test_track_outside_roi_is_held_without_a_hit():
+    tracker = Tracker(max_age_s=1.5)
+    tracker.update(dets((10, 10, 60, 60)), 0.0)
+    for step in range(1, 5):
+        tracks = tracker.update(dets(), step * 0.5, roi=(200, 200, 300, 300))
+    assert tracks["hits"].tolist() == [1]
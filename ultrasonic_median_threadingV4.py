@@ -1,11 +1,14 @@
-import RPi.GPIO as GPIO
-import time
-import statistics
-import threading
 import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "project_root"))
+from gpio_backend import get_backend
+from sound_speed import DistanceConverter, FixedTemperature
+from ranging import EdgeTimedSensor, RangingScheduler
 
 # --- GPIO SETUP ---
-GPIO.setmode(GPIO.BOARD)
+backend = get_backend()
 
 # Pins for sensor 1
 TRIG1 = 11  # GPIO 17
@@ -15,77 +18,51 @@ ECHO1 = 12  # GPIO 18
 TRIG2 = 13  # GPIO 27
 ECHO2 = 15  # GPIO 22
 
-GPIO.setup(TRIG1, GPIO.OUT)
-GPIO.setup(ECHO1, GPIO.IN)
-GPIO.setup(TRIG2, GPIO.OUT)
-GPIO.setup(ECHO2, GPIO.IN)
+MAX_RANGE_CM = 200
+AMBIENT_TEMP_C = 30.0
+AMBIENT_HUMIDITY = 80.0
+
+# Temperature-compensated conversion shared by both sensors
+converter = DistanceConverter(FixedTemperature(AMBIENT_TEMP_C, AMBIENT_HUMIDITY))
 
-GPIO.output(TRIG1, False)
-GPIO.output(TRIG2, False)
+# Echo timeout derived from the max range (~12 ms), edges captured by interrupt callbacks
+sensor1 = EdgeTimedSensor(backend, TRIG1, ECHO1, max_range_cm=MAX_RANGE_CM, converter=converter)
+sensor2 = EdgeTimedSensor(backend, TRIG2, ECHO2, max_range_cm=MAX_RANGE_CM, converter=converter)
 
 print("Wait for sensors to settle...")
 time.sleep(2)
 
-# --- Function: Measure Distance with Timeout and Median Filter ---
-def measure_distance(trig, echo, samples=5):
-    readings = []
-    for _ in range(samples):
-        GPIO.output(trig, True)
-        time.sleep(0.00001)
-        GPIO.output(trig, False)
-
-        # Wait for echo start with timeout
-        timeout_start = time.time()
-        while GPIO.input(echo) == 0:
-            if time.time() - timeout_start > 0.02:  # 20 ms timeout
-                return None
-        pulse_start = time.time()
-
-        # Wait for echo end with timeout
-        timeout_start = time.time()
-        while GPIO.input(echo) == 1:
-            if time.time() - timeout_start > 0.02:
-                return None
-        pulse_end = time.time()
-
-        pulse_duration = pulse_end - pulse_start
-        distance = pulse_duration * 17150  # convert to cm
-        readings.append(distance)
-        time.sleep(0.05)
-
-    if readings:
-        return round(statistics.median(readings), 2)
-    return None
-
-# --- Threaded Measurement ---
-def sensor_thread(trig, echo, result_dict, key):
-    result_dict[key] = measure_distance(trig, echo)
+# --- Scheduler: one long-lived thread fires both sensors in turn ---
+# Free-running: the next sensor fires as soon as the previous echo returns or
+# times out, never two sensors pinging at once
+scheduler = RangingScheduler([sensor1, sensor2], rate_hz=None, filter_window=5, quorum=3)
+ring = scheduler.ring
+
+# --- Rolling Median: every ping updates a 5-sample window per sensor ---
+# A reading is reported while at least 3 of the last 5 pings came back
+def filtered_distance(channel):
+    reading = ring.latest(channel)
+    if reading is None:
+        return None, 0.0
+    return reading.filtered, reading.quality
 
 # --- MAIN LOOP ---
 try:
+    scheduler.start()
     while True:
-        result = {}
-
-        t1 = threading.Thread(target=sensor_thread, args=(TRIG1, ECHO1, result, "sensor1"))
-        t2 = threading.Thread(target=sensor_thread, args=(TRIG2, ECHO2, result, "sensor2"))
-        t1.start()
-        t2.start()
-        t1.join()
-        t2.join()
-
         # Clear terminal each loop
         # os.system('clear')  # use 'cls' on Windows
 
-        dist1 = result.get("sensor1")
-        dist2 = result.get("sensor2")
+        dist1, quality1 = filtered_distance(0)
+        dist2, quality2 = filtered_distance(1)
 
         if dist1 is not None:
-            print(f"Sensor 1 Distance: {dist1} cm")
+            print(f"Sensor 1 Distance: {dist1} cm (quality {quality1:.0%})")
         else:
             print("Sensor 1: No reading (timeout)")
 
         if dist2 is not None:
-            print(f"Sensor 2 Distance: {dist2} cm")
+            print(f"Sensor 2 Distance: {dist2} cm (quality {quality2:.0%})")
         else:
             print("Sensor 2: No reading (timeout)")
 
@@ -95,4 +72,7 @@ except KeyboardInterrupt:
     print("Stopped by user")
 
 finally:
-    GPIO.cleanup()
+    scheduler.stop()
+    sensor1.close()
+    sensor2.close()
+    backend.cleanup()
@@ -1,8 +1,16 @@
-import RPi.GPIO as GPIO
 import time
 import os
-import datetime
-from zoneinfo import ZoneInfo
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "project_root"))
+from firebase_batch import BatchUploader
+from telemetry_encoder import DeadbandEncoder
+from clock import clock
+from speech import SpeechScheduler
+from phrase_cache import alert_vocabulary, make_speaker
+from gpio_backend import get_backend
+from sound_speed import DistanceConverter, FixedTemperature
+from ranging import EdgeTimedSensor
 
 # === Firebase Setup ===
 import firebase_admin
@@ -12,58 +20,50 @@ cred = credentials.Certificate("/home/coe/firebase/firebase-key.json")
 firebase_admin.initialize_app(cred, {
     "databaseURL": "https://sidp-5fcae-default-rtdb.asia-southeast1.firebasedatabase.app/"
 })
-root = db.reference("ultrasonicDB")
+# Readings are batched into one multi-path update() every 5 s, off the sensing loop
+root = db.reference("/")
+uploader = BatchUploader(root, flush_ms=5000).start()
 print("Firebase initialized successfully (Ultrasonic)!")
 
-malaysia_tz = ZoneInfo("Asia/Kuala_Lumpur")
+# === TTS: pre-rendered alerts, newest band replaces a queued one ===
+speech = SpeechScheduler(make_speaker(alert_vocabulary() + ["object ahead"])).start()
 
 # === GPIO SETUP ===
-GPIO.setmode(GPIO.BOARD)
+# get_backend(): RPi.GPIO or lgpio on the Pi, SIDP_GPIO_BACKEND=sim elsewhere
+backend = get_backend()
 
 TRIG = 11
 ECHO = 12
+MAX_RANGE_CM = 400          # HC-SR04 limit; sizes the echo timeout (~24 ms)
 
-GPIO.setup(TRIG, GPIO.OUT)
-GPIO.setup(ECHO, GPIO.IN)
+AMBIENT_TEMP_C = 30.0       # outdoor Malaysia
+AMBIENT_HUMIDITY = 80.0
 
-GPIO.output(TRIG, False)
+# Echo edges are timestamped by interrupt callbacks (no busy-wait), and the
+# pulse width is converted with the temperature-compensated speed of sound
+converter = DistanceConverter(FixedTemperature(AMBIENT_TEMP_C, AMBIENT_HUMIDITY))
+sensor = EdgeTimedSensor(backend, TRIG, ECHO, max_range_cm=MAX_RANGE_CM, converter=converter)
 print("Waiting for sensor to settle...")
 time.sleep(2)
 
-# === FUNCTION TO MEASURE DISTANCE ===
-def measure_distance():
-    GPIO.output(TRIG, True)
-    time.sleep(0.00001)
-    GPIO.output(TRIG, False)
-
-    pulse_start = time.time()
-    pulse_end = time.time()
-
-    while GPIO.input(ECHO) == 0:
-        pulse_start = time.time()
-
-    while GPIO.input(ECHO) == 1:
-        pulse_end = time.time()
-
-    pulse_duration = pulse_end - pulse_start
-    distance = pulse_duration * 17150
-    return round(distance, 2)
-
 # === MAIN LOOP ===
 try:
     last_message = None
     last_announce_time = 0
     announce_interval = 2  # seconds
+    # upload on band change, a 10 cm move or a 60 s heartbeat
+    telemetry = DeadbandEncoder(delta_cm=10.0, heartbeat_s=60.0)
 
     while True:
-        distance = measure_distance()
+        converter.maybe_refresh()
+        distance = sensor.measure_distance()
+        if distance is None:
+            print("No reading (timeout)")
+            time.sleep(1)
+            continue
         print(f"Distance: {distance} cm")  # <-- timestamp NOT printed
 
-        current_time = time.time()
-
-        # Malaysia timestamp for Firebase only
-        now = datetime.datetime.now(malaysia_tz)
-        timestamp = now.strftime("%Y/%m/%d %H:%M:%S")
+        current_time = clock.wall()
 
         # === Threshold logic ===
         if distance < 50:
@@ -77,19 +77,15 @@ try:
 
         # === TTS logic ===
         if message and (message != last_message or current_time - last_announce_time > announce_interval):
-            os.system(f"espeak '{message}'")
+            speech.say(message, priority=1, key="range")
             last_message = message
             last_announce_time = current_time
 
-        # === Firebase upload WITH timestamp (NOT printed) ===
-        firebase_data = {
-            "timestamp": timestamp,
-            "distance_cm": distance,
-            "message": message if message else "None"
-        }
-
-        root.push(firebase_data)
-        print("Uploaded to Firebase")  # <-- timestamp not shown
+        # === Firebase upload WITH timestamp (NOT printed), change-driven ===
+        firebase_data = telemetry.offer(distance, message if message else "None", current_time)
+        if firebase_data is not None:
+            firebase_data["timestamp"] = clock.format(current_time)  # Malaysia time
+            uploader.add("ultrasonicDB", firebase_data)
 
         time.sleep(1)
 
@@ -97,4 +93,7 @@ except KeyboardInterrupt:
     print("Stopped by user")
 
 finally:
-    GPIO.cleanup()
+    uploader.stop()
+    speech.stop()
+    sensor.close()
+    backend.cleanup()